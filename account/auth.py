@@ -1,11 +1,27 @@
+import logging
+import time
 from datetime import datetime, timedelta
 
 from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .token_cache import token_revocations, tokens_revoked_key, verified_tokens
+
+logger = logging.getLogger(__name__)
+
+# Claims copied into every token so requests can be authorized without
+# loading the user row, see account.authentication.AccessTokenUser
+ACCESS_CONTROL_CLAIMS = ("username", "role", "is_staff", "is_superuser")
+
 
 def get_tokens_for_user(user):
     refresh = RefreshToken.for_user(user)
+    for claim in ACCESS_CONTROL_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    # Sub-second issue time, compared against revoke_user_tokens markers
+    refresh["auth_time"] = time.time()
 
     return {
         "refresh": str(refresh),
@@ -14,3 +30,33 @@ def get_tokens_for_user(user):
                        + settings.SIMPLE_JWT.get("ACCESS_TOKEN_LIFETIME")
                        - timedelta(hours=1),
     }
+
+
+def revoke_user_tokens(user_id):
+    """
+    Invalidate every token issued to the user so far. Outstanding refresh
+    tokens are blacklisted. Access tokens issued before now are rejected by
+    AccessControlMiddleware, and refresh tokens by RevocationCheckedTokenRefreshSerializer
+    since rotated ones are never outstanding, until they would have expired anyway.
+    """
+    outstanding = OutstandingToken.objects.filter(
+        user_id=user_id,
+        blacklistedtoken__isnull=True,
+    )
+    BlacklistedToken.objects.bulk_create(
+        [BlacklistedToken(token=token) for token in outstanding],
+        ignore_conflicts=True,
+    )
+    revoked_at = time.time()
+    # Rotation keeps refresh tokens alive, the marker must outlive the last one issued
+    lifetime = max(
+        settings.SIMPLE_JWT.get("ACCESS_TOKEN_LIFETIME"),
+        settings.SIMPLE_JWT.get("REFRESH_TOKEN_LIFETIME"),
+    ).total_seconds()
+    try:
+        cache.set(tokens_revoked_key(user_id), revoked_at, timeout=int(lifetime))
+    except Exception as exc:
+        # Only this process knows, other processes keep accepting the tokens
+        logger.error('Could not share the token revocation of user %s: %s', user_id, exc)
+    token_revocations.set(user_id, revoked_at, revoked_at + token_revocations.local_timeout)
+    verified_tokens.evict_user(user_id)
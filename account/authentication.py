@@ -0,0 +1,49 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+
+
+class AccessTokenUser(TokenUser):
+    """
+    Stateless user built from the access-control claims embedded by
+    account.auth.get_tokens_for_user. Exposes the same role helpers as
+    UserProfile so permission classes and views work without a database hit.
+    """
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+    @property
+    def is_admin(self):
+        return self.role == "Admin"
+
+    @property
+    def is_manager(self):
+        return self.role == "Manager"
+
+    @property
+    def is_user(self):
+        return self.role == "User"
+
+    def __eq__(self, other):
+        # Compare equal to the UserProfile the token was issued for
+        if hasattr(other, 'pk') and not isinstance(other, TokenUser):
+            return self.pk == other.pk
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return super().__hash__()
+
+
+class AccessControlAuthentication(JWTAuthentication):
+    """
+    Reuses the user and token payload that AccessControlMiddleware already
+    resolved, so a request is decoded and its user loaded only once. Routes
+    the middleware lets through untouched fall back to plain JWT authentication.
+    """
+
+    def authenticate(self, request):
+        payload = getattr(request._request, 'token_payload', None)
+        if payload is not None:
+            return request._request.user, payload
+        return super().authenticate(request)
@@ -7,6 +7,10 @@ from django.http import JsonResponse
 from django.utils import timezone
 from rest_framework import status
 
+from .authentication import AccessTokenUser
+from .token_cache import RevocationUnavailable, token_revocations, verified_tokens
+from .user_cache import user_cache
+
 
 class TokenValidationError(Exception):
     """Custom exception for token validation errors"""
@@ -48,12 +52,15 @@ class AccessControlMiddleware:
         try:
             token = auth_header.split(' ')[1]
             validated_token = self.validate_token(token, request)
+            user = self.get_user(validated_token)
 
-            # Attach user and token info to request
-            request.user = validated_token.get('user')
+            # Attach user and token info to request, DRF views reuse both
+            # through account.authentication.AccessControlAuthentication
+            request.user = user
+            request.token = token
             request.token_payload = validated_token
 
-            user_role = validated_token.get('user').role
+            user_role = user.role
 
             current_time = timezone.localtime().time()
 
@@ -73,6 +80,10 @@ class AccessControlMiddleware:
             return JsonResponse({
                 'error': str(e)
             }, status=status.HTTP_401_UNAUTHORIZED)
+        except RevocationUnavailable:
+            return JsonResponse({
+                'error': 'Token revocations are unavailable, try again later'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
         return self.get_response(request)
 
@@ -80,6 +91,38 @@ class AccessControlMiddleware:
         """
         Comprehensive token validation with multiple checks
         """
+        payload = verified_tokens.get(token)
+        if payload is None:
+            payload = self.verify_token(token)
+
+        # Role or activation changes revoke every token issued before them
+        revoked_at = token_revocations.revoked_at(payload.get('user_id'))
+        if revoked_at and payload.get('auth_time', payload.get('iat', 0)) < revoked_at:
+            verified_tokens.evict(token)
+            raise TokenValidationError("Token has been revoked")
+
+        # Role-based access control
+        user_roles = payload.get('roles', [])
+        required_roles = getattr(request, 'required_roles', [])
+
+        if required_roles and not any(role in user_roles for role in required_roles):
+            raise TokenValidationError("Insufficient permissions")
+
+        # Time-based access control
+        current_time = datetime.datetime.utcnow().time()
+        access_end = payload.get('expire_time')
+
+        if access_end:
+            if access_end and current_time > datetime.datetime.strptime(access_end, '%H:%M').time():
+                raise TokenValidationError("Access not allowed after specified time")
+
+        return payload
+
+    def verify_token(self, token):
+        """
+        Signature, expiry and age checks. These only depend on the token
+        itself, so the result is cached until the token can no longer pass them.
+        """
         try:
             # Decode token
             payload = jwt.decode(
@@ -87,39 +130,47 @@ class AccessControlMiddleware:
                 settings.SECRET_KEY,
                 algorithms=['HS256']
             )
+        except jwt.ExpiredSignatureError:
+            raise TokenValidationError("Token signature has expired")
+        except jwt.InvalidTokenError:
+            raise TokenValidationError("Invalid token")
 
-            # Check token expiration
-            exp = payload.get('exp')
-            if not exp or exp < datetime.datetime.utcnow().timestamp():
-                raise TokenValidationError("Token has expired")
+        # Refresh tokens share the signing key but must not authenticate requests
+        if payload.get('token_type') != 'access':
+            raise TokenValidationError("Invalid token type")
 
-            # Optional: Check issued at time (prevent very old tokens)
-            iat = payload.get('iat')
-            max_token_age = 30 * 24 * 60 * 60  # 30 days
-            if iat and (datetime.datetime.utcnow().timestamp() - iat > max_token_age):
-                raise TokenValidationError("Token is too old")
+        # Check token expiration
+        now = datetime.datetime.utcnow().timestamp()
+        exp = payload.get('exp')
+        if not exp or exp < now:
+            raise TokenValidationError("Token has expired")
 
-            # Role-based access control
-            user_roles = payload.get('roles', [])
-            required_roles = getattr(request, 'required_roles', [])
+        # Optional: Check issued at time (prevent very old tokens)
+        iat = payload.get('iat')
+        max_token_age = 30 * 24 * 60 * 60  # 30 days
+        if iat and (now - iat > max_token_age):
+            raise TokenValidationError("Token is too old")
 
-            if required_roles and not any(role in user_roles for role in required_roles):
-                raise TokenValidationError("Insufficient permissions")
+        expires_at = min(exp, iat + max_token_age) if iat else exp
+        verified_tokens.set(token, payload, expires_at)
+        return payload
 
-            # Time-based access control
-            current_time = datetime.datetime.utcnow().time()
-            access_end = payload.get('expire_time')
+    def get_user(self, payload):
+        """
+        Resolve the token's user once per request. Tokens carrying the
+        access-control claims are trusted as is, older ones load the user row.
+        """
+        if 'role' in payload:
+            return AccessTokenUser(payload)
 
-            if access_end:
-                if access_end and current_time > datetime.datetime.strptime(access_end, '%H:%M').time():
-                    raise TokenValidationError("Access not allowed after specified time")
+        user = user_cache.get(payload.get('user_id'))
+        if user is None:
+            raise TokenValidationError("User not found")
 
-            return payload
+        if not user.is_active:
+            raise TokenValidationError("User is inactive")
 
-        except jwt.ExpiredSignatureError:
-            raise TokenValidationError("Token signature has expired")
-        except jwt.InvalidTokenError:
-            raise TokenValidationError("Invalid token")
+        return user
 
 
 def require_roles(*roles):
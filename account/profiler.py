@@ -0,0 +1,267 @@
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+# The profile of the request being handled, None when it was not sampled
+current_profile = ContextVar('current_profile', default=None)
+
+# Placeholder lists of IN (...) clauses vary with the number of values
+PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+
+
+def fingerprint(sql):
+    """
+    The shape of a query, the same for every execution that only differs
+    in its parameters
+    """
+    return PLACEHOLDER_LIST.sub('%s, ...', sql)
+
+
+def latency_percentiles(latencies):
+    """
+    Nearest-rank p50/p95/p99 of ``latencies`` (sorted, in seconds), in
+    milliseconds
+    """
+    return {
+        f'p{percentile}': round(latencies[len(latencies) * percentile // 100] * 1000, 2)
+        for percentile in (50, 95, 99)
+    }
+
+
+class RequestProfile:
+    """
+    What one request cost: SQL queries by fingerprint, time spent in the
+    database and in serializers, and the total latency
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self._serializing = 0
+
+    @property
+    def query_count(self):
+        return sum(self.queries.values())
+
+    def duplicates(self):
+        """
+        Repeats of every query that ran more than once, the same query run
+        again and again is usually an N+1
+        """
+        return {sql: count - 1 for sql, count in self.queries.items() if count > 1}
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[fingerprint(sql)] += 1
+
+    @contextmanager
+    def serializing(self):
+        # Nested serializers are part of their parent's time
+        self._serializing += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._serializing -= 1
+            if not self._serializing:
+                self.serializer_time += time.perf_counter() - started
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join(
+            f'{name};dur={seconds * 1000:.1f}' for name, seconds in (
+                ('db', self.db_time), ('serializer', self.serializer_time), ('total', self.duration)
+            )
+        )
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Counts the enclosed block as serializer time of the current profile
+    """
+    profile = current_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.serializing():
+        yield
+
+
+class EndpointStats:
+    """
+    Request profiles aggregated per endpoint (method and URL name) in this
+    process. Latencies keep the last ``max_samples`` requests of each
+    endpoint for percentiles.
+    """
+
+    def __init__(self, max_samples=1000, max_duplicates=10):
+        self.max_samples = max_samples
+        self.max_duplicates = max_duplicates
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = defaultdict(self._new_endpoint)
+
+    def _new_endpoint(self):
+        return {
+            'requests': 0,
+            'queries': 0,
+            'db_time': 0.0,
+            'serializer_time': 0.0,
+            'latencies': deque(maxlen=self.max_samples),
+            'duplicates': Counter(),
+        }
+
+    def add(self, endpoint, profile):
+        with self._lock:
+            stats = self._endpoints[endpoint]
+            stats['requests'] += 1
+            stats['queries'] += profile.query_count
+            stats['db_time'] += profile.db_time
+            stats['serializer_time'] += profile.serializer_time
+            stats['latencies'].append(profile.duration)
+            stats['duplicates'].update(profile.duplicates())
+
+    def snapshot(self):
+        """
+        Per endpoint averages, latency percentiles (milliseconds) and the
+        most repeated queries, busiest endpoints first
+        """
+        with self._lock:
+            endpoints = {
+                endpoint: {**stats, 'latencies': sorted(stats['latencies']), 'duplicates': Counter(stats['duplicates'])}
+                for endpoint, stats in self._endpoints.items()
+            }
+
+        result = []
+        for endpoint, stats in sorted(endpoints.items(), key=lambda item: -item[1]['requests']):
+            requests, latencies = stats['requests'], stats['latencies']
+            result.append({
+                'endpoint': endpoint,
+                'requests': requests,
+                'queries_per_request': round(stats['queries'] / requests, 2),
+                'db_ms_per_request': round(stats['db_time'] * 1000 / requests, 2),
+                'serializer_ms_per_request': round(stats['serializer_time'] * 1000 / requests, 2),
+                'latency_ms': latency_percentiles(latencies),
+                'duplicate_queries': [
+                    {'sql': sql, 'repeats': repeats}
+                    for sql, repeats in stats['duplicates'].most_common(self.max_duplicates)
+                ],
+            })
+        return result
+
+
+endpoint_stats = EndpointStats(
+    max_samples=getattr(settings, 'REQUEST_PROFILER_MAX_SAMPLES', 1000),
+)
+
+
+def install_serializer_timer():
+    """
+    Time every top-level ``serializer.data`` as serializer time. Nested
+    serializers and list children are rendered inside it.
+    """
+    data = serializers.BaseSerializer.data
+    if getattr(data.fget, 'profiled', False):
+        return
+
+    def profiled_data(self):
+        with serializer_timer():
+            return data.fget(self)
+
+    profiled_data.profiled = True
+    serializers.BaseSerializer.data = property(profiled_data)
+
+
+def recording(profile):
+    """
+    Context manager adding the queries and serializer time of the block
+    to ``profile``
+    """
+    stack = ExitStack()
+    stack.callback(current_profile.reset, current_profile.set(profile))
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(profile.record_query))
+    return stack
+
+
+class RequestProfilerMiddleware:
+    """
+    Profiles a REQUEST_PROFILER_SAMPLE_RATE share of the requests: SQL
+    query count and time, repeated query fingerprints, serializer time and
+    latency. The figures go to endpoint_stats (served by
+    /account/profiler/) and, for admins, in DEBUG or with
+    REQUEST_PROFILER_PUBLIC_HEADERS, into Server-Timing, X-Query-Count and
+    X-Duplicate-Queries response headers.
+
+    Streaming responses (exports) fetch their rows while the body is sent,
+    so they are measured until the last chunk and get no headers. Async
+    streams (task events) never end and are measured up to their first byte.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILER_SAMPLE_RATE', 0.0)
+        self.public_headers = getattr(settings, 'REQUEST_PROFILER_PUBLIC_HEADERS', False)
+        if self.sample_rate > 0:
+            install_serializer_timer()
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        with recording(profile):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        endpoint = f'{request.method} {match.view_name if match else "unresolved"}'
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.profiled_stream(response.streaming_content, profile, endpoint)
+            return response
+
+        profile.finish()
+        endpoint_stats.add(endpoint, profile)
+        if self.public_headers or settings.DEBUG or getattr(request.user, 'is_admin', False):
+            response['Server-Timing'] = profile.server_timing()
+            response['X-Query-Count'] = str(profile.query_count)
+            response['X-Duplicate-Queries'] = str(sum(profile.duplicates().values()))
+        return response
+
+    @staticmethod
+    def profiled_stream(content, profile, endpoint):
+        """
+        ``content`` with every chunk produced under ``profile``, which is
+        added to endpoint_stats once the body is sent or abandoned
+        """
+        chunks = iter(content)
+        try:
+            while True:
+                with recording(profile):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            profile.finish()
+            endpoint_stats.add(endpoint, profile)
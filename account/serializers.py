@@ -1,8 +1,12 @@
 from django.contrib.auth.hashers import check_password
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import UserProfile
+from .token_cache import RevocationUnavailable, token_revocations
+from .user_cache import user_cache
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,6 +25,19 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user_profile
 
 
+class CachedUserSerializer(UserRegistrationSerializer):
+    """
+    Read-only nested user that resolves the foreign key through
+    account.user_cache instead of a per-object SELECT
+    """
+
+    def get_attribute(self, instance):
+        field = instance._meta.get_field(self.source)
+        if field.is_cached(instance):
+            return field.get_cached_value(instance)
+        return user_cache.get(getattr(instance, field.attname))
+
+
 class UserLoginSerializer(serializers.Serializer):
     username = serializers.CharField(required=True)
     password = serializers.CharField(required=True)
@@ -52,10 +69,29 @@ class UserLoginSerializer(serializers.Serializer):
 
 
 class TokenRevokeSerializer(serializers.Serializer):
-    refresh_token = serializers.CharField(max_length=255, required=True)
+    # Refresh tokens carry the access-control claims of account.auth, username included
+    refresh_token = serializers.CharField(max_length=2048, required=True)
 
     def create(self, validated_data):
         refresh_token = validated_data["refresh_token"]
         token = RefreshToken(refresh_token)
         token.blacklist()
         return TokenRevokeSerializer()
+
+
+class RevocationCheckedTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses refresh tokens issued before account.auth.revoke_user_tokens ran
+    for their user. Rotated refresh tokens are never outstanding, so
+    blacklisting does not reach them and they keep the claims of the login.
+    """
+
+    def validate(self, attrs):
+        payload = RefreshToken(attrs["refresh"]).payload
+        try:
+            revoked_at = token_revocations.revoked_at(payload.get("user_id"))
+        except RevocationUnavailable:
+            raise InvalidToken("Token revocations are unavailable, try again later")
+        if revoked_at and payload.get("auth_time", payload.get("iat", 0)) < revoked_at:
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
@@ -1,9 +1,18 @@
+import functools
+
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 import random
 
+from account.auth import revoke_user_tokens
 from account.models import UserProfile, EmailCode
+from account.user_cache import user_cache
+
+# Fields whose change revokes the user's tokens, the claims
+# get_tokens_for_user copies into them plus activation
+ACCESS_CONTROL_FIELDS = ('role', 'is_active', 'is_staff', 'is_superuser')
 
 
 @receiver(post_save, sender=UserProfile)
@@ -17,3 +26,27 @@ def create_user_profile(sender, instance, created, **kwargs):
         link = f"{settings.BACKEND_SERVER_BASE_URL}/account/verify_signup_email/{instance.email}/{email_code.mail_code}"
         print(link)
         # TODO: Need to implement send email logic
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # After the commit, a read in between would cache the old row again
+    transaction.on_commit(functools.partial(user_cache.invalidate, instance.pk))
+
+
+@receiver(pre_save, sender=UserProfile)
+def track_access_control_changes(sender, instance, **kwargs):
+    if instance._state.adding or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*ACCESS_CONTROL_FIELDS).first()
+    instance._access_control_changed = bool(previous) and any(
+        previous[field] != getattr(instance, field) for field in ACCESS_CONTROL_FIELDS
+    )
+
+
+@receiver(post_save, sender=UserProfile)
+def revoke_tokens_on_access_control_change(sender, instance, created, **kwargs):
+    # Tokens carry the role and admin flags, so they must not outlive a role change
+    if not created and getattr(instance, '_access_control_changed', False):
+        revoke_user_tokens(instance.pk)
@@ -1,3 +1,262 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .auth import get_tokens_for_user, revoke_user_tokens
+from .models import UserProfile
+from .token_cache import VerifiedTokenCache, token_revocations, tokens_revoked_key, verified_tokens
+from .user_cache import UserCache, user_cache
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Redis on a port nothing listens on
+UNREACHABLE_CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:9/0',
+        'OPTIONS': {'SOCKET_CONNECT_TIMEOUT': 0.1, 'SOCKET_TIMEOUT': 0.1},
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenRevocationTests(TestCase):
+    """
+    Revocation markers are read from the shared cache once per local timeout
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        verified_tokens.clear()
+        token_revocations.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def test_marker_read_once_per_local_timeout(self):
+        client = self.client_for(self.admin)
+        with mock.patch.object(cache, 'get', wraps=cache.get) as get:
+            self.assertEqual(client.get('/account/profiler/').status_code, 200)
+            self.assertEqual(client.get('/account/profiler/').status_code, 200)
+        revocation_reads = [call for call in get.call_args_list if call.args[0] == tokens_revoked_key(self.admin.pk)]
+        self.assertEqual(len(revocation_reads), 1)
+
+    def test_revocation_applies_in_process_at_once(self):
+        client = self.client_for(self.admin)
+        self.assertEqual(client.get('/account/profiler/').status_code, 200)
+        revoke_user_tokens(self.admin.pk)
+        response = client.get('/account/profiler/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['error'], 'Token has been revoked')
+        self.assertEqual(self.client_for(self.admin).get('/account/profiler/').status_code, 200)
+
+    def test_admin_flag_changes_revoke_tokens(self):
+        client = self.client_for(self.admin)
+        self.admin.is_staff = True
+        self.admin.save()
+        self.assertEqual(client.get('/account/profiler/').status_code, 401)
+
+    def test_rotated_refresh_tokens_revoked(self):
+        manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        refresh = get_tokens_for_user(manager)['refresh']
+        response = APIClient().post('/account/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()['refresh']
+
+        manager.role = 'User'
+        manager.save()
+        # Long after the access tokens issued before the demotion expired
+        later = time.time() + settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds() * 2
+        token_revocations.clear()
+        with mock.patch('time.time', return_value=later):
+            response = APIClient().post('/account/token/refresh/', {'refresh': rotated})
+        self.assertEqual(response.status_code, 401)
+
+        response = APIClient().post('/account/token/refresh/', {'refresh': get_tokens_for_user(manager)['refresh']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unreachable_cache_fails_open(self):
+        client = self.client_for(self.admin)
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError('Connection refused')), \
+                self.assertLogs('account.token_cache', 'WARNING'):
+            self.assertEqual(client.get('/account/profiler/').status_code, 200)
+
+    def test_unreachable_cache_fails_closed(self):
+        client = self.client_for(self.admin)
+        with mock.patch.object(cache, 'get', side_effect=ConnectionError('Connection refused')), \
+                mock.patch.object(token_revocations, 'fail_open', False):
+            self.assertEqual(client.get('/account/profiler/').status_code, 503)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VerifiedTokenCacheTests(TestCase):
+    """
+    Verified access token payloads are kept until the token expires, within
+    a bounded LRU
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        token_revocations.clear()
+
+    def test_payload_expires_with_the_token(self):
+        access = get_tokens_for_user(self.admin)['access']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/account/profiler/').status_code, 200)
+        payload = verified_tokens.get(access)
+        self.assertEqual(payload['user_id'], self.admin.pk)
+
+        with mock.patch('time.time', return_value=payload['exp'] - 1):
+            self.assertIsNotNone(verified_tokens.get(access))
+        with mock.patch('time.time', return_value=payload['exp']):
+            self.assertIsNone(verified_tokens.get(access))
+
+    def test_size_bound(self):
+        tokens = VerifiedTokenCache(max_size=2)
+        expires_at = time.time() + 60
+        tokens.set('a', {'user_id': 1}, expires_at)
+        tokens.set('b', {'user_id': 2}, expires_at)
+        tokens.get('a')
+        tokens.set('c', {'user_id': 3}, expires_at)
+        self.assertEqual(len(tokens), 2)
+        # The least recently used entry goes first
+        self.assertIsNone(tokens.get('b'))
+        self.assertEqual([tokens.get('a'), tokens.get('c')], [{'user_id': 1}, {'user_id': 3}])
+
+    def test_revocation_evicts_the_user(self):
+        tokens = [get_tokens_for_user(self.admin)['access'] for _ in range(2)]
+        for token in tokens:
+            APIClient().get('/account/profiler/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(len(verified_tokens), 2)
+        revoke_user_tokens(self.admin.pk)
+        self.assertEqual(len(verified_tokens), 0)
+
+    def test_logout_ends_the_session(self):
+        tokens = get_tokens_for_user(self.admin)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(client.put('/account/logout/', {'refresh_token': tokens['refresh']}).status_code, 200)
+        response = APIClient().post('/account/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+        # The access token lives on until it expires
+        self.assertEqual(client.get('/account/profiler/').status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AuthenticationTests(TestCase):
+    """
+    AccessControlMiddleware decodes the token and resolves the user, DRF reuses both
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        verified_tokens.clear()
+        token_revocations.clear()
+
+    def get(self, access):
+        with mock.patch('account.middleware.jwt.decode', wraps=jwt.decode) as decode, \
+                mock.patch.object(JWTAuthentication, 'get_validated_token') as drf_decode, \
+                mock.patch.object(user_cache, 'get_many', wraps=user_cache.get_many) as load_users:
+            response = APIClient().get('/account/profiler/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+        drf_decode.assert_not_called()
+        return load_users.call_count
+
+    def test_claims_token_loads_no_user(self):
+        access = get_tokens_for_user(self.admin)['access']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(access), 0)
+
+    def test_token_without_claims_loads_the_user_once(self):
+        access = str(RefreshToken.for_user(self.admin).access_token)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(access), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserCacheTests(TestCase):
+    """
+    The shared tier only holds the fields the request path reads
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.users = UserCache()
+
+    def test_shared_tier_leaves_out_the_password(self):
+        self.users.get(self.manager.pk)
+        cached = cache.get(self.users.shared_key(self.manager.pk))
+        self.assertEqual(cached, {
+            'id': self.manager.pk, 'username': 'manager', 'email': 'manager@example.com', 'role': 'Manager',
+            'is_active': True, 'is_staff': False, 'is_superuser': False,
+        })
+
+        self.users.local.clear()
+        with self.assertNumQueries(0):
+            user = self.users.get(self.manager.pk)
+            self.assertEqual((user.username, user.role, user.is_manager, user.is_active), ('manager', 'Manager', True, True))
+        self.assertEqual(user.get_deferred_fields(), {'password', 'last_login', 'first_name', 'last_name', 'date_joined'})
+
+    def test_invalidated_once_committed(self):
+        user_cache.get(self.manager.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.role = 'Admin'
+            self.manager.save()
+            self.assertEqual(user_cache.get(self.manager.pk).role, 'Manager')
+        self.assertEqual(user_cache.get(self.manager.pk).role, 'Admin')
+
+    @override_settings(CACHES=UNREACHABLE_CACHES)
+    def test_unreachable_cache_falls_back_to_the_database(self):
+        user_cache.clear()
+        with self.assertLogs('account.user_cache', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/account/register/', {
+                'username': 'new', 'email': 'new@example.com', 'password': 'pw', 'role': 'User'
+            })
+        self.assertEqual(response.status_code, 201, response.content)
+
+        with self.assertLogs('account.user_cache', 'WARNING'):
+            self.assertEqual(user_cache.get(self.manager.pk).role, 'Manager')
+        with self.assertLogs('account', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.manager.role = 'Admin'
+            self.manager.save()
+        with self.assertLogs('account.user_cache', 'WARNING'):
+            self.assertEqual(user_cache.get(self.manager.pk).role, 'Admin')
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .lru import ExpiringLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def tokens_revoked_key(user_id):
+    return f"user:{user_id}:tokens_revoked_at"
+
+
+class RevocationUnavailable(Exception):
+    """
+    The shared cache holding the revocation markers could not be read
+    """
+
+
+class VerifiedTokenCache(ExpiringLRUCache):
+    """
+    Bounded, per-process LRU of access token payloads that already passed
+    signature, expiry and age checks. Entries are keyed by a digest of the raw
+    token so the tokens themselves are never kept in memory, and expire with
+    the token. Evicting an entry only makes the next request verify the token
+    again; tokens are denied by the revocation markers of TokenRevocationCache.
+    """
+
+    @staticmethod
+    def digest(token):
+        if isinstance(token, str):
+            token = token.encode()
+        return hashlib.sha256(token).hexdigest()
+
+    def get(self, token, default=None):
+        return super().get(self.digest(token), default)
+
+    def set(self, token, payload, expires_at):
+        super().set(self.digest(token), payload, expires_at)
+
+    def evict(self, token):
+        self.delete(self.digest(token))
+
+    def evict_user(self, user_id):
+        """
+        Drop every cached payload issued to ``user_id``, whose tokens were revoked
+        """
+        self.delete_where(lambda payload: payload.get('user_id') == user_id)
+
+
+class TokenRevocationCache(ExpiringLRUCache):
+    """
+    Per-process copy of the revocation markers account.auth.revoke_user_tokens
+    writes to the shared cache, keyed by user id. Each user's marker is read
+    from the shared cache at most once every ``local_timeout`` seconds, so
+    revocations made by other processes apply after that long at the latest.
+
+    With ``fail_open`` an unreachable shared cache counts as no revocation
+    for ``local_timeout`` seconds instead of failing every request; markers
+    could not be written during the outage either. Without it lookups raise
+    RevocationUnavailable.
+    """
+
+    def __init__(self, max_size=1024, local_timeout=5, fail_open=True):
+        super().__init__(max_size=max_size)
+        self.local_timeout = local_timeout
+        self.fail_open = fail_open
+
+    def revoked_at(self, user_id):
+        """
+        Time the user's tokens were last revoked at, 0 if they never were
+        """
+        revoked_at = self.get(user_id)
+        if revoked_at is None:
+            try:
+                revoked_at = cache.get(tokens_revoked_key(user_id)) or 0
+            except Exception as exc:
+                if not self.fail_open:
+                    raise RevocationUnavailable(str(exc)) from exc
+                logger.warning('Could not read the token revocations of user %s: %s', user_id, exc)
+                revoked_at = 0
+            self.set(user_id, revoked_at, time.time() + self.local_timeout)
+        return revoked_at
+
+
+verified_tokens = VerifiedTokenCache(
+    max_size=getattr(settings, 'ACCESS_TOKEN_CACHE_SIZE', 1024)
+)
+
+token_revocations = TokenRevocationCache(
+    max_size=getattr(settings, 'ACCESS_TOKEN_CACHE_SIZE', 1024),
+    local_timeout=getattr(settings, 'TOKEN_REVOCATION_LOCAL_TIMEOUT', 5),
+    fail_open=getattr(settings, 'TOKEN_REVOCATION_FAIL_OPEN', True),
+)
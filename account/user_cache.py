@@ -0,0 +1,120 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DEFERRED
+
+from .lru import ExpiringLRUCache
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+
+class UserCache:
+    """
+    Two-tier cache of UserProfile rows keyed by id. The first tier is a
+    bounded per-process LRU, the optional second tier is the shared Django
+    cache (Redis). Saves and deletes invalidate both tiers through
+    account.signals once committed; other processes drop their local copy
+    after ``local_timeout`` seconds at the latest.
+
+    Only ``fields`` are loaded and cached, the password hash and the other
+    columns stay in the database and are deferred on the cached instances.
+    While the shared cache is unreachable users are loaded from the database.
+    """
+
+    key_prefix = 'user_fields'
+    # What the middleware, the permission classes and the nested user serializers read
+    fields = ('id', 'username', 'email', 'role', 'is_active', 'is_staff', 'is_superuser')
+
+    def __init__(self, max_size=1024, local_timeout=60, shared_timeout=300, shared=True):
+        self.local = ExpiringLRUCache(max_size=max_size)
+        self.local_timeout = local_timeout
+        self.shared_timeout = shared_timeout
+        self.shared = shared
+
+    def from_values(self, values):
+        """
+        UserProfile as loaded by only(*fields) from the shared tier's field values
+        """
+        return UserProfile.from_db(
+            UserProfile.objects.db,
+            self.fields,
+            [values.get(field.attname, DEFERRED) for field in UserProfile._meta.concrete_fields],
+        )
+
+    def shared_key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def get(self, user_id):
+        if user_id is None:
+            return None
+        return self.get_many([user_id]).get(user_id)
+
+    def get_many(self, user_ids):
+        """
+        Resolve ``user_ids`` to UserProfile instances, going to the shared
+        tier and then the database once each for whatever is still missing.
+        """
+        users = {}
+        missing = set()
+        for user_id in user_ids:
+            if user_id is None:
+                continue
+            user = self.local.get(user_id)
+            if user is None:
+                missing.add(user_id)
+            else:
+                users[user_id] = user
+
+        if missing and self.shared:
+            try:
+                found = cache.get_many([self.shared_key(user_id) for user_id in missing])
+            except Exception as exc:
+                logger.warning('Could not read %d cached users: %s', len(missing), exc)
+                found = {}
+            for values in found.values():
+                user = self.from_values(values)
+                users[user.pk] = user
+                self.local.set(user.pk, user, time.time() + self.local_timeout)
+                missing.discard(user.pk)
+
+        if missing:
+            loaded = {user.pk: user for user in UserProfile.objects.filter(pk__in=missing).only(*self.fields)}
+            for user_id, user in loaded.items():
+                users[user_id] = user
+                self.local.set(user_id, user, time.time() + self.local_timeout)
+            if loaded and self.shared:
+                try:
+                    cache.set_many(
+                        {
+                            self.shared_key(user_id): {field: getattr(user, field) for field in self.fields}
+                            for user_id, user in loaded.items()
+                        },
+                        timeout=self.shared_timeout,
+                    )
+                except Exception as exc:
+                    logger.warning('Could not cache %d users: %s', len(loaded), exc)
+
+        return users
+
+    def invalidate(self, user_id):
+        self.local.delete(user_id)
+        if self.shared:
+            try:
+                cache.delete(self.shared_key(user_id))
+            except Exception as exc:
+                # The stale copy expires after shared_timeout
+                logger.warning('Could not invalidate cached user %s: %s', user_id, exc)
+
+    def clear(self):
+        self.local.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'USER_CACHE_SIZE', 1024),
+    local_timeout=getattr(settings, 'USER_CACHE_LOCAL_TIMEOUT', 60),
+    shared_timeout=getattr(settings, 'USER_CACHE_SHARED_TIMEOUT', 300),
+    shared=getattr(settings, 'USER_CACHE_SHARED', True),
+)
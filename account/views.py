@@ -3,13 +3,16 @@ from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from .auth import get_tokens_for_user
+from .authentication import AccessControlAuthentication
 from .models import EmailCode, UserProfile
+from .profiler import endpoint_stats
 from .serializers import (
     UserRegistrationSerializer,
+    RevocationCheckedTokenRefreshSerializer,
     TokenRevokeSerializer,
     UserLoginSerializer
 )
@@ -37,8 +40,17 @@ class UserLogin(CreateAPIView):
         return Response(get_tokens_for_user(user), status=status.HTTP_200_OK)
 
 
+class RefreshView(TokenRefreshView):
+    serializer_class = RevocationCheckedTokenRefreshSerializer
+
+
 class LogoutView(APIView):
-    authentication_classes = [JWTAuthentication]
+    """
+    Blacklists the refresh token, so the session cannot be extended. The
+    access token presented stays valid until it expires (ACCESS_TOKEN_LIFETIME),
+    as access tokens are never looked up in the blacklist; clients drop it.
+    """
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = TokenRevokeSerializer
 
@@ -75,3 +87,22 @@ class VerifySignupEmail(APIView):
             email_code.is_active = False
             email_code.save()
         return Response(status=status.HTTP_200_OK)
+
+
+class ProfilerStatsView(APIView):
+    """
+    Per endpoint costs measured by RequestProfilerMiddleware in this
+    process (GET), or a fresh start (DELETE). Admins only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({'error': 'You do not have permission to view profiles.'}, status=403)
+        return Response({'endpoints': endpoint_stats.snapshot()}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        if not request.user.is_admin:
+            return Response({'error': 'You do not have permission to reset profiles.'}, status=403)
+        endpoint_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Project, Task
+from .search import search_tasks
 
 
 @admin.register(Project)
@@ -15,6 +16,7 @@ class TaskAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'priority', 'status', 'project', 'assigned_to', 'due_date', 'created_at')
     list_filter = ('priority', 'status', 'project', 'due_date')  # Add filters
     search_fields = ('title', 'description', 'assigned_to__username', 'project__name')  # Allow searching by relationships
+    search_help_text = 'Full-text search over title, description, assignee and project'
     ordering = ('-due_date',)  # Order by the nearest due dat
     fieldsets = (  # Organize fields into sections
         ('Basic Information', {
@@ -26,6 +28,12 @@ class TaskAdmin(admin.ModelAdmin):
        
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Answered by the full-text index instead of icontains scans over search_fields
+        if not search_term.strip():
+            return queryset, False
+        return search_tasks(queryset, search_term), False
+
 
 
 
@@ -0,0 +1,288 @@
+import logging
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
+
+from .counters import apply_task_changes
+from .events import change_kind, task_event, task_events
+from .models import Task, counted_state
+from .response_cache import project_responses
+
+logger = logging.getLogger(__name__)
+
+# Atomically move up to ARGV[2] members due by ARGV[1] from KEYS[1] to the
+# batches being committed in KEYS[2], leased until ARGV[3]. Leases that ran
+# out belong to drains that crashed mid-batch and are claimed again first.
+CLAIM_SCRIPT = """
+local limit = tonumber(ARGV[2])
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, limit)
+if #ids < limit then
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, limit - #ids)
+    if #due > 0 then
+        redis.call('ZREM', KEYS[1], unpack(due))
+        for _, id in ipairs(due) do
+            table.insert(ids, id)
+        end
+    end
+end
+for _, id in ipairs(ids) do
+    redis.call('ZADD', KEYS[2], ARGV[3], id)
+end
+return ids
+"""
+
+
+def approval_cache_key(task_id):
+    return f'task:{task_id}'
+
+
+def approval_cache_data(task):
+    # What ApproveTaskView keeps in the cache until the approval is committed
+    return {
+        'title': task.title,
+        'description': task.description,
+        'status': task.status,
+        'created_at': str(task.created_at)
+    }
+
+
+def live_approvals(task_ids):
+    """
+    The ids among ``task_ids`` whose task:{id} entry exists, in one round trip
+    """
+    entries = cache.get_many([approval_cache_key(task_id) for task_id in task_ids])
+    return {task_id for task_id in task_ids if approval_cache_key(task_id) in entries}
+
+
+def forget_approvals_on_commit(task_ids):
+    """
+    Delete the task:{id} entries of ``task_ids`` once the current
+    transaction commits, a rolled back commit leaves them to be retried
+    """
+    keys = [approval_cache_key(task_id) for task_id in task_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def change_status(tasks, previous, status):
+    """
+    Move ``tasks``, loaded (and locked) while in the ``previous`` status, to
+    ``status`` with one conditional UPDATE, keeping the project counters,
+    cached project responses and task events in step like Task.save() would
+    """
+    if not tasks:
+        return
+    updated_at = now()
+    Task.objects.filter(pk__in=[task.pk for task in tasks], status=previous).update(
+        status=status, updated_at=updated_at
+    )
+    changes = []
+    for task in tasks:
+        before = task._counted_state
+        task.status, task.updated_at = status, updated_at
+        changes.append((before, counted_state(task)))
+    apply_task_changes(changes)
+    project_responses.invalidate({task.project_id for task in tasks})
+    kind = change_kind(previous, status)
+    task_events.publish_on_commit(task_event(kind, task) for task in tasks)
+
+
+def approve_tasks(queryset, task_ids):
+    """
+    Approve the tasks of ``queryset`` among ``task_ids`` that are pending
+    approval, like ApproveTaskView does one at a time. Returns the outcome
+    of every id: approved, not_found or not_pending_approval.
+    """
+    with transaction.atomic():
+        tasks = queryset.select_for_update().in_bulk(task_ids)
+        approve = [task for task in tasks.values() if task.status == 'Pending Approval']
+        if approve:
+            cache.set_many(
+                {approval_cache_key(task.pk): approval_cache_data(task) for task in approve},
+                timeout=approval_commits.cache_timeout,
+            )
+        change_status(approve, 'Pending Approval', 'Approved')
+        approval_commits.schedule_on_commit(task.pk for task in approve)
+
+    approved = {task.pk for task in approve}
+    return {
+        task_id: 'not_found' if task_id not in tasks
+        else 'approved' if task_id in approved else 'not_pending_approval'
+        for task_id in task_ids
+    }
+
+
+def revoke_tasks(queryset, task_ids):
+    """
+    Send the approved tasks of ``queryset`` among ``task_ids`` back to
+    Pending Approval and drop their pending commits, like
+    RevokeApprovalView does one at a time. Returns the outcome of every id:
+    revoked, not_found or not_approved.
+    """
+    with transaction.atomic():
+        tasks = queryset.select_for_update().in_bulk(task_ids)
+        revoke = [task for task in tasks.values() if task.status == 'Approved']
+        change_status(revoke, 'Approved', 'Pending Approval')
+        if revoke:
+            # Under the row locks, so a commit waiting for them finds the approvals revoked
+            cache.delete_many([approval_cache_key(task.pk) for task in revoke])
+    if revoke:
+        approval_commits.cancel([task.pk for task in revoke])
+
+    revoked = {task.pk for task in revoke}
+    return {
+        task_id: 'not_found' if task_id not in tasks
+        else 'revoked' if task_id in revoked else 'not_approved'
+        for task_id in task_ids
+    }
+
+
+def commit_approvals(task_ids):
+    """
+    save_task_to_db for many tasks at once: approvals whose task:{id} cache
+    entry is gone were revoked and are skipped, tasks still pending approval
+    become Approved, approved tasks stay so, and the approvals of tasks
+    that moved on to another status are discarded, leaving the tasks as
+    they are. Returns (approved, discarded, skipped) counts.
+
+    The cache entries are only deleted once the transaction commits, so a
+    batch that fails or is committed twice comes to the same outcome.
+    Revocations delete them under the row locks taken here.
+    """
+    with transaction.atomic():
+        tasks = list(Task.objects.select_for_update().filter(pk__in=task_ids))
+        live_ids = live_approvals([task.pk for task in tasks])
+        tasks = [task for task in tasks if task.pk in live_ids]
+        approve = [task for task in tasks if task.status == 'Pending Approval']
+        approved = [task for task in tasks if task.status == 'Approved']
+        discarded = len(tasks) - len(approve) - len(approved)
+
+        change_status(approve, 'Pending Approval', 'Approved')
+        forget_approvals_on_commit([task.pk for task in tasks])
+
+    return len(approve) + len(approved), discarded, len(task_ids) - len(tasks)
+
+
+class ApprovalCommitQueue:
+    """
+    Approvals waiting to be committed, as a Redis sorted set of task ids
+    scored by due time. One periodic job (base.task.commit_due_approvals),
+    running every ``interval`` seconds, claims what is due and commits it in
+    batches, instead of one delayed broker message and one worker wakeup per
+    approval. Claimed batches stay in ``processing_key`` until committed, a
+    drain that dies mid-batch leaves them to be claimed again after
+    ``claim_timeout`` seconds.
+    """
+
+    key = 'approval_commits'
+    processing_key = 'approval_commits:processing'
+
+    def __init__(self, url, delay=300, interval=10, batch_size=500, claim_timeout=300):
+        self.url = url
+        self.delay = delay
+        self.interval = interval
+        self.batch_size = batch_size
+        self.claim_timeout = claim_timeout
+        self._client = None
+        self._claim = None
+
+    @property
+    def cache_timeout(self):
+        """
+        Lifetime of the task:{id} entries, which must outlive the commit:
+        due after ``delay``, claimed by a drain up to ``interval`` later, and
+        claimed again up to ``claim_timeout`` plus an interval after that
+        when the first drain died
+        """
+        return self.delay + 2 * self.interval + self.claim_timeout
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, socket_timeout=1, socket_connect_timeout=1)
+        return self._client
+
+    def schedule_on_commit(self, task_ids):
+        """
+        Commit ``task_ids`` ``delay`` seconds from now, once the current
+        transaction commits
+        """
+        task_ids = list(task_ids)
+        if task_ids:
+            transaction.on_commit(lambda: self.schedule(task_ids))
+
+    def schedule(self, task_ids):
+        due = time.time() + self.delay
+        try:
+            self.client.zadd(self.key, {str(task_id): due for task_id in task_ids})
+        except redis.RedisError as exc:
+            logger.error('Could not schedule the commit of %d approvals: %s', len(task_ids), exc)
+
+    def cancel(self, task_ids):
+        """
+        Drop the queued commits of ``task_ids`` so no drain spends time on
+        them. Best effort: commits that stay queued find their approval
+        revoked and are skipped.
+        """
+        task_ids = [str(task_id) for task_id in task_ids]
+        if not task_ids:
+            return
+        try:
+            self.client.zrem(self.key, *task_ids)
+        except redis.RedisError as exc:
+            logger.warning('Could not cancel the commit of %d approvals: %s', len(task_ids), exc)
+
+    def claim(self, limit):
+        if self._claim is None:
+            self._claim = self.client.register_script(CLAIM_SCRIPT)
+        claimed_at = time.time()
+        task_ids = self._claim(
+            keys=[self.key, self.processing_key], args=[claimed_at, limit, claimed_at + self.claim_timeout]
+        )
+        return [int(task_id) for task_id in task_ids]
+
+    def release(self, task_ids, retry=False):
+        """
+        Take a claimed batch out of processing, back into the queue as due
+        now with ``retry``
+        """
+        pipe = self.client.pipeline(transaction=True)
+        if retry:
+            pipe.zadd(self.key, {str(task_id): time.time() for task_id in task_ids})
+        pipe.zrem(self.processing_key, *[str(task_id) for task_id in task_ids])
+        pipe.execute()
+
+    def drain(self):
+        """
+        Commit every due approval, ``batch_size`` at a time. Returns the
+        (approved, discarded, skipped) totals.
+        """
+        totals = [0, 0, 0]
+        while True:
+            task_ids = self.claim(self.batch_size)
+            if not task_ids:
+                return tuple(totals)
+            try:
+                counts = commit_approvals(task_ids)
+            except Exception:
+                # Put the batch back so the next run retries it
+                self.release(task_ids, retry=True)
+                raise
+            # A crash before this point leaves the batch leased, committing
+            # it again once the lease runs out changes nothing
+            self.release(task_ids)
+            for index, count in enumerate(counts):
+                totals[index] += count
+
+
+approval_commits = ApprovalCommitQueue(
+    url=getattr(settings, 'APPROVAL_COMMITS_REDIS_URL', 'redis://localhost:6379/0'),
+    delay=getattr(settings, 'APPROVAL_COMMIT_DELAY', 300),
+    interval=getattr(settings, 'APPROVAL_COMMIT_INTERVAL', 10),
+    batch_size=getattr(settings, 'APPROVAL_COMMIT_BATCH_SIZE', 500),
+    claim_timeout=getattr(settings, 'APPROVAL_COMMIT_CLAIM_TIMEOUT', 300),
+)
@@ -4,5 +4,6 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
-    
-   
+
+    def ready(self):
+        import base.signals  # noqa
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from .cleanup import delete_tasks
+from .models import ArchivedTask
+
+
+def archive_tasks(tasks):
+    """
+    Copy ``tasks`` into the archive table and delete them from the live
+    one, as a single batch insert and delete. Clients see them leave like
+    deleted tasks, with tombstones and archived events. Call inside the
+    transaction that locked or selected them, with every field loaded.
+    """
+    ArchivedTask.objects.bulk_create([ArchivedTask.from_task(task) for task in tasks])
+    return delete_tasks(tasks, kind='archived')
+
+
+def prune_archive():
+    """
+    Drop archived tasks completed more than TASK_ARCHIVE_DAYS ago
+    """
+    days = getattr(settings, 'TASK_ARCHIVE_DAYS', 365)
+    if not days:
+        return 0
+    deleted, _ = ArchivedTask.objects.filter(updated_at__lt=now() - timedelta(days=days)).delete()
+    return deleted
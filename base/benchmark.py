@@ -0,0 +1,219 @@
+import os
+import platform
+import random
+import time
+from collections import defaultdict
+
+from django.db.models import Count
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from account.auth import get_tokens_for_user
+from account.models import UserProfile
+from account.profiler import latency_percentiles
+from account.user_cache import user_cache
+from .models import Project, Task
+from .seeding import SEED_PASSWORD, Seeder, default_counts
+
+# Relative weight of each request in the benchmark traffic
+REQUEST_MIX = {
+    'POST /account/login/': 2,
+    'GET /base/tasks/': 40,
+    'GET /base/project_details/<id>/': 25,
+    'PATCH /base/tasks/<id>/': 18,
+    'POST /base/approve/<id>/': 8,
+    'POST /base/revoke/<id>/': 7,
+}
+
+
+def machine():
+    """
+    What the timings of a run depend on besides the code
+    """
+    processor = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            processor = next(line.split(':', 1)[1].strip() for line in cpuinfo if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    return {
+        'system': platform.system(),
+        'processor': processor or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def weighted(rng, mix):
+    return rng.choices(list(mix), weights=list(mix.values()))[0]
+
+
+class LoadBenchmark:
+    """
+    Seeds ``task_count`` tasks with base.seeding, then replays ``requests`` requests drawn
+    from REQUEST_MIX through the full middleware stack, after ``warmup``
+    unmeasured ones. The traffic only depends on ``seed``. Queries per
+    request come from the X-Query-Count header of
+    account.profiler.RequestProfilerMiddleware.
+    """
+
+    def __init__(self, task_count, requests=1000, warmup=100, seed=0):
+        self.task_count = task_count
+        self.requests = requests
+        self.warmup = warmup
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def setup(self):
+        user_cache.clear()
+        Seeder(seed=self.seed).run(*default_counts(self.task_count), self.task_count)
+        # The manager with the most tasks of their own to update
+        busiest = (
+            Task.objects.filter(assigned_to__role='Manager', assigned_to__is_active=True)
+            .exclude(status='Pending Approval').values('assigned_to').annotate(tasks=Count('pk'))
+            .order_by('-tasks', 'assigned_to').first()
+        )
+        self.manager = UserProfile.objects.get(pk=busiest['assigned_to'])
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        self.project_ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+        # Kept apart from the approvals, updates never touch tasks pending approval
+        self.own_task_ids = list(
+            Task.objects.filter(assigned_to=self.manager).exclude(status='Pending Approval')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        self.pending_approval = list(
+            Task.objects.filter(status='Pending Approval').order_by('pk').values_list('pk', flat=True)
+        )
+        self.rng.shuffle(self.pending_approval)
+        self.approved = []
+
+    def next_request(self):
+        """
+        (endpoint, client, method, path, data) of the next request. Approvals
+        take tasks pending approval and revocations the tasks approved
+        earlier, so both always succeed.
+        """
+        endpoint = weighted(self.rng, REQUEST_MIX)
+        if endpoint == 'POST /base/revoke/<id>/' and not self.approved:
+            endpoint = 'POST /base/approve/<id>/'
+        if endpoint == 'POST /base/approve/<id>/' and not self.pending_approval:
+            endpoint = 'GET /base/tasks/'
+
+        if endpoint == 'POST /account/login/':
+            data = {'username': self.manager.username, 'password': SEED_PASSWORD}
+            return endpoint, self.anonymous, 'post', '/account/login/', data
+        if endpoint == 'GET /base/tasks/':
+            data = {'status': 'Pending'} if self.rng.random() < 0.25 else None
+            return endpoint, self.client, 'get', '/base/tasks/', data
+        if endpoint == 'GET /base/project_details/<id>/':
+            return endpoint, self.client, 'get', f'/base/project_details/{self.rng.choice(self.project_ids)}/', None
+        if endpoint == 'PATCH /base/tasks/<id>/':
+            data = {
+                'status': self.rng.choice(['Pending', 'In Progress', 'Completed']),
+                'priority': self.rng.choice(['Low', 'Medium', 'High']),
+            }
+            return endpoint, self.client, 'patch', f'/base/tasks/{self.rng.choice(self.own_task_ids)}/', data
+        if endpoint == 'POST /base/approve/<id>/':
+            task_id = self.pending_approval.pop()
+            self.approved.append(task_id)
+            return endpoint, self.client, 'post', f'/base/approve/{task_id}/', None
+        task_id = self.approved.pop(self.rng.randrange(len(self.approved)))
+        self.pending_approval.append(task_id)
+        return endpoint, self.client, 'post', f'/base/revoke/{task_id}/', None
+
+    def send(self, client, method, path, data):
+        started = time.perf_counter()
+        if method == 'get':
+            response = client.get(path, data)
+        else:
+            response = getattr(client, method)(path, data, format='json')
+        return response, time.perf_counter() - started
+
+    def run(self):
+        """
+        Requests per second, latency percentiles (milliseconds) and queries
+        per request, overall and per endpoint, and the failed requests
+        """
+        self.setup()
+        with override_settings(REQUEST_PROFILER_SAMPLE_RATE=1, REQUEST_PROFILER_PUBLIC_HEADERS=True):
+            for _ in range(self.warmup):
+                self.send(*self.next_request()[1:])
+
+            samples = defaultdict(list)
+            failures = []
+            started = time.perf_counter()
+            for _ in range(self.requests):
+                endpoint, *request = self.next_request()
+                response, latency = self.send(*request)
+                if response.status_code >= 400:
+                    failures.append(f'{request[1].upper()} {request[2]}: {response.status_code}')
+                samples[endpoint].append((latency, int(response.get('X-Query-Count', 0))))
+            elapsed = time.perf_counter() - started
+
+        return {
+            'tasks': self.task_count,
+            'requests': self.requests,
+            'requests_per_second': round(self.requests / elapsed, 1),
+            **self.summary([sample for endpoint_samples in samples.values() for sample in endpoint_samples]),
+            'endpoints': {endpoint: self.summary(samples[endpoint]) for endpoint in REQUEST_MIX if samples[endpoint]},
+            'failures': failures,
+        }
+
+    @staticmethod
+    def summary(samples):
+        return {
+            'count': len(samples),
+            'latency_ms': latency_percentiles(sorted(latency for latency, _ in samples)),
+            'queries_per_request': round(sum(queries for _, queries in samples) / len(samples), 2),
+        }
+
+
+def relative_p50(run, stats):
+    # Endpoint latency as a share of the whole run's, comparable across machines
+    return stats['latency_ms']['p50'] / run['latency_ms']['p50']
+
+
+def compare(baseline, results, tolerance=0.25, slack_ms=1.0, same_machine=True):
+    """
+    Regressions of ``results`` against ``baseline`` runs, both by task
+    count: a task count missing from the baseline, any extra query per
+    request and, by more than ``tolerance`` (0.25 = 25%), slower endpoints.
+    On the baseline's machine throughput and p50/p95 latencies (also by more
+    than ``slack_ms``) are compared as measured, elsewhere only each
+    endpoint's p50 relative to the run's.
+    """
+    regressions = []
+    for size, run in results.items():
+        before = baseline.get(size)
+        if before is None:
+            regressions.append(f'{size} tasks: no baseline, record one with --save')
+            continue
+        if same_machine and run['requests_per_second'] < before['requests_per_second'] / (1 + tolerance):
+            regressions.append(
+                f"{size} tasks: {run['requests_per_second']} requests/s, baseline {before['requests_per_second']}"
+            )
+        for endpoint, stats in run['endpoints'].items():
+            expected = before['endpoints'].get(endpoint)
+            if expected is None:
+                continue
+            if stats['queries_per_request'] > expected['queries_per_request'] + 0.01:
+                regressions.append(
+                    f"{size} tasks, {endpoint}: {stats['queries_per_request']} queries per request, "
+                    f"baseline {expected['queries_per_request']}"
+                )
+            if not same_machine:
+                share, limit = relative_p50(run, stats), relative_p50(before, expected)
+                if share > limit * (1 + tolerance):
+                    regressions.append(
+                        f'{size} tasks, {endpoint}: p50 {share:.2f}x the run p50, baseline {limit:.2f}x'
+                    )
+                continue
+            for percentile in ('p50', 'p95'):
+                latency, limit = stats['latency_ms'][percentile], expected['latency_ms'][percentile]
+                if latency > limit * (1 + tolerance) and latency > limit + slack_ms:
+                    regressions.append(
+                        f'{size} tasks, {endpoint}: {percentile} {latency} ms, baseline {limit} ms'
+                    )
+    return regressions
@@ -0,0 +1,54 @@
+from django.db import router, transaction
+
+from .counters import apply_task_changes
+from .events import task_event, task_events
+from .models import Task
+from .response_cache import project_responses
+from .sync import record_tombstones
+
+# What delete_tasks needs of each task: the counted state, the tombstone
+# and the deleted event
+DELETED_TASK_FIELDS = ('id', 'title', 'status', 'due_date', 'project_id', 'assigned_to_id', 'updated_at')
+
+
+def delete_tasks(tasks, kind='deleted'):
+    """
+    Delete ``tasks`` with one DELETE, doing for the whole batch what the
+    post_delete receivers of base.signals do row by row: project counters,
+    cached project responses, tombstones and ``kind`` events. Call inside
+    the transaction that locked or selected them.
+    """
+    if not tasks:
+        return 0
+    queryset = Task.objects.filter(pk__in=[task.pk for task in tasks])
+    # Nothing cascades from Task (the search index follows through its
+    # trigger), so skip the collector that would load and signal every row
+    deleted = queryset._raw_delete(router.db_for_write(Task))
+    apply_task_changes((task._counted_state, None) for task in tasks)
+    project_responses.invalidate({task.project_id for task in tasks})
+    record_tombstones((task.pk, task.project_id, task.assigned_to_id) for task in tasks)
+    task_events.publish_on_commit(task_event(kind, task) for task in tasks)
+    return deleted
+
+
+def delete_in_batches(queryset, batch_size, start_after=0, remove=delete_tasks, fields=DELETED_TASK_FIELDS):
+    """
+    Delete the tasks of ``queryset`` in primary key order, ``batch_size``
+    per transaction, so no run holds locks or loads rows for longer than
+    one batch. ``remove`` does the deleting (e.g. base.archive.archive_tasks)
+    from the ``fields`` it loads, all of them when None. Yields (deleted,
+    last_id) after each batch; resume an interrupted run by passing the
+    last ``last_id`` as ``start_after``.
+    """
+    last_id = start_after
+    while True:
+        with transaction.atomic():
+            batch = queryset.filter(pk__gt=last_id).order_by('pk').select_for_update()
+            if fields:
+                batch = batch.only(*fields)
+            tasks = list(batch[:batch_size])
+            if not tasks:
+                return
+            deleted = remove(tasks)
+        last_id = tasks[-1].pk
+        yield deleted, last_id
@@ -0,0 +1,143 @@
+import hashlib
+from datetime import datetime
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+CONDITIONAL_HEADERS = (
+    'HTTP_IF_MATCH',
+    'HTTP_IF_NONE_MATCH',
+    'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+
+def has_conditional_headers(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def make_validators(key, user, state):
+    """
+    Strong ETag and Last-Modified timestamp for a representation. ``state``
+    is a tuple of everything the representation depends on; the newest
+    datetime in it is the Last-Modified value.
+    """
+    normalized = tuple(value.isoformat() if isinstance(value, datetime) else value for value in state)
+    digest = hashlib.sha1(repr((key, getattr(user, 'id', None), normalized)).encode()).hexdigest()
+    timestamps = [value for value in state if isinstance(value, datetime)]
+    last_modified = int(max(timestamps).timestamp()) if timestamps else None
+    return quote_etag(digest), last_modified
+
+
+def with_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalObjectMixin:
+    """
+    ETag/Last-Modified for detail views. With conditional headers present the
+    validators come from ``lookup_state`` (one narrow query) and a 304 or 412
+    is returned before the object is loaded or serialized. Otherwise they are
+    derived from the loaded object by ``object_state`` at no extra cost; both
+    must describe the object the same way.
+    """
+
+    def object_state(self, instance):
+        return instance.pk, instance.updated_at
+
+    def lookup_state(self, queryset):
+        return queryset.values_list('pk', 'updated_at').first()
+
+    def get_object(self):
+        # Loaded once per request, shared by the handler and the validators
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def lookup_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        return queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def precondition_response(self, request):
+        if not has_conditional_headers(request):
+            return None
+        state = self.lookup_state(self.lookup_queryset())
+        if state is None:
+            # Let the handler raise its usual 404
+            return None
+        etag, last_modified = make_validators(request.path, request.user, state)
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def respond_with_validators(self, request, response):
+        if response.status_code != 200:
+            return response
+        state = self.object_state(self.get_object())
+        return with_validators(response, *make_validators(request.path, request.user, state))
+
+    def get(self, request, *args, **kwargs):
+        return self.precondition_response(request) or self.respond_with_validators(
+            request, super().get(request, *args, **kwargs)
+        )
+
+    def put(self, request, *args, **kwargs):
+        return self.precondition_response(request) or self.respond_with_validators(
+            request, super().put(request, *args, **kwargs)
+        )
+
+    def patch(self, request, *args, **kwargs):
+        return self.precondition_response(request) or self.respond_with_validators(
+            request, super().patch(request, *args, **kwargs)
+        )
+
+
+class ConditionalListMixin:
+    """
+    ETag/Last-Modified for paginated list views, computed from the primary
+    key and ``modified_field`` of every row of the page and whether pages
+    follow or precede it. Without conditional headers they are derived from
+    the page the handler loads at no extra cost. With them the same page is
+    fetched narrowly (one query) and a match gets a 304 before the rows are
+    loaded or serialized. Like the page itself, this never reads past it.
+    """
+
+    modified_field = 'updated_at'
+
+    def page_state(self, page):
+        pk_name = self.get_queryset().model._meta.pk.attname
+        state = [self.paginator.has_next, self.paginator.has_previous]
+        for row in page:
+            # Model instances, or values() rows on the fast list path (base.rows)
+            for name in (pk_name, self.modified_field):
+                state.append(row[name] if isinstance(row, dict) else getattr(row, name))
+        return tuple(state)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self._page_state = self.page_state(page)
+        return page
+
+    def lookup_state(self):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        ordering = self.paginator.get_ordering(queryset)
+        fields = dict.fromkeys([
+            queryset.model._meta.pk.attname, self.modified_field, *(field.lstrip('-') for field in ordering)
+        ])
+        return self.page_state(self.paginator.paginate_queryset(queryset.values(*fields), self.request, view=self))
+
+    def get(self, request, *args, **kwargs):
+        if self.paginator is not None and has_conditional_headers(request):
+            etag, last_modified = make_validators(request.get_full_path(), request.user, self.lookup_state())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+        response = super().get(request, *args, **kwargs)
+        state = getattr(self, '_page_state', None)
+        if state is None:
+            return response
+        return with_validators(response, *make_validators(request.get_full_path(), request.user, state))
@@ -0,0 +1,97 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils.timezone import now
+
+from .models import STATUS_COUNTERS, Project, Task
+from .response_cache import project_responses
+
+
+def state_deltas(before, after):
+    """
+    Counter changes on Project for a task moving from ``before`` to
+    ``after``, both counted_state() tuples or None for a missing task
+    """
+    deltas = Counter()
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        project_id, status, overdue = state
+        deltas[project_id, 'total_tasks'] += sign
+        if status in STATUS_COUNTERS:
+            deltas[project_id, STATUS_COUNTERS[status]] += sign
+        if overdue:
+            deltas[project_id, 'overdue_tasks'] += sign
+    return Counter({key: value for key, value in deltas.items() if value})
+
+
+def apply_deltas(deltas):
+    """
+    Apply accumulated counter changes with one F() UPDATE per project.
+    Decrements stop at zero: a task that fell overdue after it was counted
+    leaves overdue_tasks as if it was, until recount_projects catches up.
+    """
+    per_project = defaultdict(dict)
+    for (project_id, column), delta in deltas.items():
+        if delta > 0:
+            per_project[project_id][column] = F(column) + delta
+        elif delta < 0:
+            per_project[project_id][column] = Greatest(F(column) + delta, 0)
+    for project_id, updates in per_project.items():
+        Project.objects.filter(pk=project_id).update(**updates)
+
+
+def apply_task_changes(changes):
+    """
+    Apply counter changes for many tasks at once, e.g. after bulk_create or
+    a queryset update. ``changes`` yields (before, after) counted states.
+    """
+    deltas = Counter()
+    for before, after in changes:
+        for key, value in state_deltas(before, after).items():
+            deltas[key] += value
+    apply_deltas(deltas)
+
+
+def computed_counters(project_ids=None):
+    """
+    Counters recomputed from the task table, keyed by project id
+    """
+    aggregates = {
+        'total_tasks': Count('id'),
+        'overdue_tasks': Count('id', filter=Q(due_date__lt=now()) & ~Q(status='Completed')),
+    }
+    for status, column in STATUS_COUNTERS.items():
+        aggregates[column] = Count('id', filter=Q(status=status))
+
+    tasks = Task.objects.all()
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+    return {
+        row.pop('project_id'): row
+        for row in tasks.order_by().values('project_id').annotate(**aggregates)
+    }
+
+
+def recount_projects(project_ids=None, dry_run=False):
+    """
+    Compare every project's stored counters with the task table and repair
+    the ones that drifted. Returns the ids of the projects that were off.
+    """
+    columns = ['total_tasks', 'overdue_tasks', *STATUS_COUNTERS.values()]
+    computed = computed_counters(project_ids)
+    projects = Project.objects.only('id', *columns)
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+
+    drifted = []
+    for project in projects.iterator(chunk_size=2000):
+        expected = computed.get(project.pk, dict.fromkeys(columns, 0))
+        if any(getattr(project, column) != expected[column] for column in columns):
+            drifted.append(project.pk)
+            if not dry_run:
+                Project.objects.filter(pk=project.pk).update(**expected)
+    if not dry_run:
+        project_responses.invalidate(drifted)
+    return drifted
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_KEY = 'task_events:last_id'
+ALL_CHANNEL = 'task_events:all'
+
+
+def user_channel(user_id):
+    return f'task_events:user:{user_id}'
+
+
+def project_channel(project_id):
+    return f'task_events:project:{project_id}'
+
+
+def history_key(channel):
+    return f'{channel}:history'
+
+
+def task_event(kind, task, previous=None):
+    """
+    (channels, payload) of a task event. The event goes to the assignee,
+    the project and the all-tasks channel, and to the previous assignee and
+    project when the task moved away from them.
+    """
+    previous = previous or {}
+    channels = {ALL_CHANNEL, project_channel(task.project_id)}
+    for user_id in (task.assigned_to_id, previous.get('assigned_to_id')):
+        if user_id is not None:
+            channels.add(user_channel(user_id))
+    if previous.get('project_id') is not None:
+        channels.add(project_channel(previous['project_id']))
+
+    return sorted(channels), {
+        'type': kind,
+        'task': {
+            'id': task.pk,
+            'title': task.title,
+            'status': task.status,
+            'project': task.project_id,
+            'assigned_to': task.assigned_to_id,
+            'updated_at': task.updated_at.isoformat() if task.updated_at else None,
+        },
+    }
+
+
+def change_kind(previous_status, status):
+    if previous_status != 'Approved' and status == 'Approved':
+        return 'approved'
+    if previous_status == 'Approved' and status == 'Pending Approval':
+        return 'revoked'
+    return 'updated'
+
+
+def moved_from(previous, current):
+    """
+    The previous assignee and project of a task, where they changed
+    """
+    return {
+        name: previous[name] for name in ('project_id', 'assigned_to_id')
+        if previous.get(name) is not None and name in current and previous[name] != current[name]
+    }
+
+
+class TaskEventBus:
+    """
+    Fans task events out through Redis pub/sub so every worker process can
+    push them to its own subscribers. Each event gets a global id and is
+    also kept in a short per-channel history (a sorted set scored by id) so
+    reconnecting clients can resume after their Last-Event-ID.
+    """
+
+    def __init__(self, url, history_size=1000, history_timeout=3600, keepalive=15):
+        self.url = url
+        self.history_size = history_size
+        self.history_timeout = history_timeout
+        self.keepalive = keepalive
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, socket_timeout=1, socket_connect_timeout=1)
+        return self._client
+
+    def async_client(self):
+        """
+        New redis.asyncio client, one per subscriber
+        """
+        return aioredis.Redis.from_url(self.url)
+
+    def publish_on_commit(self, events):
+        """
+        Publish ``events`` (from task_event) once the current transaction
+        commits; nothing is sent for rolled back writes
+        """
+        events = list(events)
+        if events:
+            transaction.on_commit(lambda: self.publish(events))
+
+    def publish(self, events):
+        # Notifications are best effort, a Redis outage must not fail writes
+        try:
+            last_id = self.client.incrby(EVENT_ID_KEY, len(events))
+            pipe = self.client.pipeline(transaction=False)
+            for event_id, (channels, payload) in enumerate(events, start=last_id - len(events) + 1):
+                message = json.dumps({'id': event_id, **payload}, separators=(',', ':'))
+                for channel in channels:
+                    key = history_key(channel)
+                    pipe.zadd(key, {message: event_id})
+                    pipe.zremrangebyrank(key, 0, -self.history_size - 1)
+                    pipe.expire(key, self.history_timeout)
+                    pipe.publish(channel, message)
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning('Could not publish %d task events: %s', len(events), exc)
+
+    async def subscribe(self, channels, last_event_id=None):
+        """
+        Async iterator of the events published to ``channels`` as (id, type,
+        json) tuples, preceded by the history after ``last_event_id``. Yields
+        None every ``keepalive`` seconds without events.
+        """
+        client = self.async_client()
+        pubsub = client.pubsub()
+        # Subscribe before reading the history so nothing falls in between,
+        # duplicates are dropped by id
+        await pubsub.subscribe(*channels)
+        seen = set()
+        recent = deque(maxlen=self.history_size)
+
+        def unseen(message):
+            event = json.loads(message)
+            if event['id'] in seen:
+                return None
+            if len(recent) == recent.maxlen:
+                seen.discard(recent[0])
+            recent.append(event['id'])
+            seen.add(event['id'])
+            return event['id'], event['type'], message.decode() if isinstance(message, bytes) else message
+
+        try:
+            if last_event_id is not None:
+                backlog = {}
+                for channel in channels:
+                    for message, score in await client.zrangebyscore(
+                        history_key(channel), f'({last_event_id}', '+inf', withscores=True
+                    ):
+                        backlog[int(score)] = message
+                for event_id in sorted(backlog):
+                    event = unseen(backlog[event_id])
+                    if event:
+                        yield event
+
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.keepalive)
+                if message is None:
+                    yield None
+                    continue
+                event = unseen(message['data'])
+                if event:
+                    yield event
+        finally:
+            try:
+                await asyncio.shield(pubsub.aclose())
+                await asyncio.shield(client.aclose())
+            except redis.RedisError:
+                pass
+
+
+task_events = TaskEventBus(
+    url=getattr(settings, 'TASK_EVENTS_REDIS_URL', 'redis://localhost:6379/0'),
+    history_size=getattr(settings, 'TASK_EVENTS_HISTORY_SIZE', 1000),
+    history_timeout=getattr(settings, 'TASK_EVENTS_HISTORY_TIMEOUT', 3600),
+    keepalive=getattr(settings, 'TASK_EVENTS_KEEPALIVE', 15),
+)
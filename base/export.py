@@ -0,0 +1,112 @@
+import csv
+import datetime
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .models import PROJECT_COUNTERS
+
+TASK_EXPORT_FIELDS = (
+    'id', 'title', 'description', 'due_date', 'priority', 'status',
+    'project', 'assigned_to', 'created_by', 'created_at', 'updated_at',
+)
+PROJECT_EXPORT_FIELDS = (
+    'id', 'name', 'description', 'created_by', 'created_at', 'updated_at', *PROJECT_COUNTERS,
+)
+
+# Rows per database round trip and per chunk written to the client
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """
+    Datetimes formatted like DRF's DateTimeField, with full precision
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            value = o.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return super().default(o)
+
+
+encoder = ExportEncoder(separators=(',', ':'))
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Selects the export format; the rows themselves are streamed by
+    stream_rows, so only error payloads are rendered here, as one JSON line
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (encoder.encode(data) + '\n').encode(self.charset)
+
+
+class CSVRenderer(NDJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class LineBuffer:
+    """
+    File-like target for csv.writer that hands back each written line
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    ``fields`` of every row as plain dicts, fetched ``chunk_size`` rows at a
+    time without building model instances
+    """
+    return queryset.order_by('id').values(*fields).iterator(chunk_size=chunk_size)
+
+
+def ndjson_lines(rows, fields):
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows, fields):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([csv_value(row[field]) for field in fields])
+
+
+def csv_value(value):
+    # Dates formatted as in the JSON exports and API responses
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return encoder.default(value)
+    return value
+
+
+FORMATS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def stream_rows(queryset, fields, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    The export of ``queryset`` in ``export_format`` as text chunks of about
+    ``chunk_size`` rows each, so memory stays flat whatever the row count
+    """
+    lines = FORMATS[export_format](export_rows(queryset, fields, chunk_size), fields)
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,139 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+
+from base.benchmark import LoadBenchmark, compare, machine
+from base.testing import redis_stand_in
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a mix of logins, task lists, project details, task updates and approvals against a freshly '
+        'seeded test database and reports latency percentiles, requests per second and queries per request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, nargs='+', default=[1000],
+            help='Task counts to seed, one run each (e.g. 1000 100000 1000000)'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Measured requests per run'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=100,
+            help='Unmeasured requests sent first'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the generated data and traffic'
+        )
+        parser.add_argument(
+            '--redis-url',
+            help='Scratch Redis for the cache, approval commits and task events; in-process stand-ins without it'
+        )
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Store the results as the baseline (--baseline)'
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Fail when the results regress from the baseline (--baseline)'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Baseline file (BENCHMARK_BASELINE)'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed latency and throughput regression, as a share of the baseline'
+        )
+
+    def handle(self, *args, **kwargs):
+        baseline_path = kwargs.get('baseline') or getattr(settings, 'BENCHMARK_BASELINE', 'benchmarks/baseline.json')
+        config = {
+            'requests': kwargs['requests'],
+            'warmup': kwargs['warmup'],
+            'seed': kwargs['seed'],
+            'redis': 'server' if kwargs.get('redis_url') else 'memory',
+        }
+        baseline = None
+        if kwargs.get('compare') or kwargs.get('save'):
+            try:
+                with open(baseline_path) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except FileNotFoundError:
+                if kwargs.get('compare'):
+                    raise CommandError(f'No baseline at {baseline_path}, record one with --save.')
+        if kwargs.get('compare') and baseline['config'] != config:
+            raise CommandError(f"The baseline was recorded with {baseline['config']}, not {config}.")
+        # Timings only compare as measured on the machine that recorded them
+        this_machine = machine()
+        same_machine = bool(baseline) and baseline.get('machine') == this_machine
+        if kwargs.get('compare') and not same_machine:
+            self.stdout.write(
+                f"The baseline was recorded on {baseline.get('machine', 'an unknown machine')}, "
+                f"comparing queries and relative latencies only."
+            )
+
+        results = {}
+        setup_test_environment(debug=False)
+        try:
+            with redis_stand_in(kwargs.get('redis_url')):
+                for task_count in kwargs['tasks']:
+                    self.stdout.write(f'Seeding {task_count} tasks...')
+                    databases = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS})
+                    try:
+                        run = LoadBenchmark(task_count, kwargs['requests'], kwargs['warmup'], kwargs['seed']).run()
+                    finally:
+                        teardown_databases(databases, verbosity=0)
+                    self.report(run)
+                    results[str(task_count)] = run
+        finally:
+            teardown_test_environment()
+
+        failures = [failure for run in results.values() for failure in run['failures']]
+        if failures:
+            raise CommandError(f'{len(failures)} requests failed, first: {failures[0]}')
+
+        if kwargs.get('compare'):
+            regressions = compare(baseline['results'], results, kwargs['tolerance'], same_machine=same_machine)
+            for regression in regressions:
+                self.stdout.write(f'  regression: {regression}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {baseline_path}.')
+            self.stdout.write(f'No regressions against {baseline_path}.')
+
+        if kwargs.get('save'):
+            # Runs of other task counts recorded with the same settings on this machine are kept
+            stored = baseline['results'] if same_machine and baseline['config'] == config else {}
+            with open(baseline_path, 'w') as baseline_file:
+                json.dump(
+                    {'config': config, 'machine': this_machine, 'results': {**stored, **results}},
+                    baseline_file, indent=2,
+                )
+                baseline_file.write('\n')
+            self.stdout.write(f'Baseline saved to {baseline_path}.')
+
+    def report(self, run):
+        latency = run['latency_ms']
+        self.stdout.write(
+            f"{run['tasks']} tasks: {run['requests_per_second']} requests/s, "
+            f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+            f"{run['queries_per_request']} queries per request"
+        )
+        for endpoint, stats in run['endpoints'].items():
+            latency = stats['latency_ms']
+            self.stdout.write(
+                f"  {endpoint:<34}{stats['count']:>6}  p50 {latency['p50']:>8} ms  p95 {latency['p95']:>8} ms  "
+                f"p99 {latency['p99']:>8} ms  {stats['queries_per_request']:>6} queries"
+            )
@@ -0,0 +1,32 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from base.export import EXPORT_CHUNK_SIZE, FORMATS, PROJECT_EXPORT_FIELDS, TASK_EXPORT_FIELDS, stream_rows
+from base.models import Project, Task
+
+
+class Command(BaseCommand):
+    help = 'Streams all tasks or projects as NDJSON or CSV, like /base/tasks/export/ and /base/projects/export/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=['tasks', 'projects'])
+        parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson', dest='export_format')
+        parser.add_argument('--status', help='Only export tasks with this status')
+        parser.add_argument('--output', help='File to write, defaults to stdout')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **kwargs):
+        if kwargs['model'] == 'tasks':
+            queryset, fields = Task.objects.all(), TASK_EXPORT_FIELDS
+            if kwargs.get('status'):
+                queryset = queryset.filter(status=kwargs['status'])
+        else:
+            queryset, fields = Project.objects.all(), PROJECT_EXPORT_FIELDS
+
+        chunks = stream_rows(queryset, fields, kwargs['export_format'], kwargs['chunk_size'])
+        if kwargs.get('output'):
+            with open(kwargs['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from base.response_cache import project_responses
+
+
+class Command(BaseCommand):
+    help = 'Shows hit and miss counts of the project response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **kwargs):
+        stats = project_responses.stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  coalesced: {stats['coalesced']}  misses: {stats['misses']}  "
+            f"hit rate: {stats['hit_rate']:.1%}"
+        )
+        if kwargs.get('reset'):
+            project_responses.reset_stats()
+            self.stdout.write('Counters reset.')
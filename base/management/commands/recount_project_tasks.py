@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from base.counters import recount_projects
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the task counters stored on projects and repairs any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project', type=int, action='append', dest='projects',
+            help='Only recount this project id, can be repeated'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted projects without repairing them'
+        )
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs.get('dry_run', False)
+        drifted = recount_projects(kwargs.get('projects'), dry_run=dry_run)
+
+        action = 'would be repaired' if dry_run else 'repaired'
+        self.stdout.write(f'{len(drifted)} projects {action}.')
+        for project_id in drifted:
+            self.stdout.write(f'  project {project_id}')
@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.seeding import SEED_PASSWORD, Seeder, default_counts
+
+
+class Command(BaseCommand):
+    help = 'Loads synthetic users, projects, tasks and email codes at production scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=100000,
+            help='Tasks to create'
+        )
+        parser.add_argument(
+            '--users', type=int,
+            help='Users to create, one per 100 tasks by default'
+        )
+        parser.add_argument(
+            '--projects', type=int,
+            help='Projects to create, one per 500 tasks by default'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed of the generated data'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50000,
+            help='Rows written per transaction'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Processes generating the rows of each table while the command writes them'
+        )
+        parser.add_argument(
+            '--password', default=SEED_PASSWORD,
+            help='Password of every seeded user'
+        )
+
+    def handle(self, *args, **kwargs):
+        tasks = kwargs['tasks']
+        users, projects = default_counts(tasks)
+        users = users if kwargs.get('users') is None else kwargs['users']
+        projects = projects if kwargs.get('projects') is None else kwargs['projects']
+        if tasks and (not users or not projects):
+            raise CommandError('Tasks need at least one user and one project.')
+
+        started = time.monotonic()
+        seeder = Seeder(
+            seed=kwargs['seed'],
+            batch_size=kwargs['batch_size'],
+            workers=kwargs['workers'],
+            password=kwargs['password'],
+            progress=lambda table, count: self.stdout.write(
+                f'{count} {table} written after {time.monotonic() - started:.1f}s.'
+            ),
+        )
+        seeder.run(users, projects, tasks)
+        self.stdout.write(
+            f'{users} users, {projects} projects and {tasks} tasks seeded in {time.monotonic() - started:.1f}s.'
+        )
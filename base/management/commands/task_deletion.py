@@ -1,20 +1,88 @@
+import argparse
+import time
+from functools import partial
+
 from django.core.management.base import BaseCommand
 from django.utils.timezone import now, timedelta
+from base.archive import archive_tasks, prune_archive
+from base.cleanup import delete_in_batches
 from base.models import Task
+from base.sync import prune_tombstones
 
 class Command(BaseCommand):
-    help = 'Deletes completed tasks older than a configurable period'
+    help = 'Deletes or archives completed tasks older than a configurable period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Tasks deleted per transaction (TASK_DELETION_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--sleep', type=float,
+            help='Seconds to pause between batches so API writes get the database (TASK_DELETION_SLEEP)'
+        )
+        parser.add_argument(
+            '--time-budget', type=float,
+            help='Stop after this many seconds, 0 for no limit (TASK_DELETION_TIME_BUDGET)'
+        )
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Resume a run that stopped early, from the id it reported'
+        )
+        parser.add_argument(
+            '--archive', action=argparse.BooleanOptionalAction,
+            help='Move the tasks to the archive table instead of dropping them (TASK_DELETION_ARCHIVE)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only count the tasks that would be deleted'
+        )
 
     def handle(self, *args, **kwargs):
         # Set the deletion period (configurable in settings)
         from django.conf import settings
         days = getattr(settings, 'TASK_DELETION_DAYS', 2)
         deletion_time = now() - timedelta(days=days)
+        batch_size = kwargs.get('batch_size') or getattr(settings, 'TASK_DELETION_BATCH_SIZE', 1000)
+        sleep = kwargs.get('sleep')
+        sleep = getattr(settings, 'TASK_DELETION_SLEEP', 0.1) if sleep is None else sleep
+        time_budget = kwargs.get('time_budget')
+        time_budget = getattr(settings, 'TASK_DELETION_TIME_BUDGET', 600) if time_budget is None else time_budget
+        start_after = kwargs.get('start_after') or 0
+        archive = kwargs.get('archive')
+        archive = getattr(settings, 'TASK_DELETION_ARCHIVE', False) if archive is None else archive
+        if archive:
+            action, batches = 'archived', partial(delete_in_batches, remove=archive_tasks, fields=None)
+        else:
+            action, batches = 'deleted', delete_in_batches
 
-        # Delete tasks that meet the criteria
-        tasks_deleted, _ = Task.objects.filter(
+        # Tasks that meet the criteria
+        tasks = Task.objects.filter(
             status='Completed',
             updated_at__lt=deletion_time
-        ).delete()
+        )
+
+        if kwargs.get('dry_run'):
+            count = tasks.filter(pk__gt=start_after).count()
+            self.stdout.write(f'{count} tasks would be {action}.')
+            return
+
+        started = time.monotonic()
+        tasks_deleted = 0
+        for deleted, last_id in batches(tasks, batch_size, start_after):
+            tasks_deleted += deleted
+            self.stdout.write(f'{tasks_deleted} tasks {action} so far, up to id {last_id}.')
+            if time_budget and time.monotonic() - started + sleep >= time_budget:
+                self.stdout.write(
+                    f'{tasks_deleted} tasks {action}, time budget used up. Resume with --start-after {last_id}.'
+                )
+                return
+            time.sleep(sleep)
+
+        self.stdout.write(f'{tasks_deleted} tasks {action} successfully.')
+
+        tombstones_deleted = prune_tombstones()
+        self.stdout.write(f'{tombstones_deleted} task tombstones pruned.')
 
-        self.stdout.write(f'{tasks_deleted} tasks deleted successfully.')
+        archived_deleted = prune_archive()
+        self.stdout.write(f'{archived_deleted} archived tasks pruned.')
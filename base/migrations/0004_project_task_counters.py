@@ -0,0 +1,67 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:37
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+STATUS_COUNTERS = {
+    'Pending': 'pending_tasks',
+    'In Progress': 'in_progress_tasks',
+    'Completed': 'completed_tasks',
+    'Pending Approval': 'pending_approval_tasks',
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Project = apps.get_model('base', 'Project')
+    Task = apps.get_model('base', 'Task')
+    aggregates = {
+        'total_tasks': Count('id'),
+        'overdue_tasks': Count('id', filter=Q(due_date__lt=timezone.now()) & ~Q(status='Completed')),
+    }
+    for status, column in STATUS_COUNTERS.items():
+        aggregates[column] = Count('id', filter=Q(status=status))
+
+    for row in Task.objects.order_by().values('project_id').annotate(**aggregates):
+        Project.objects.filter(pk=row.pop('project_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0003_task_project_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='completed_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='in_progress_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='overdue_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='pending_approval_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='pending_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='total_tasks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,206 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Text of a task as indexed: its own title and description plus the names of
+# its assignee and project, looked up when the task row is written
+SQLITE_DOCUMENT = """
+    new.id, new.title, new.description,
+    COALESCE((SELECT username FROM account_userprofile WHERE id = new.assigned_to_id), ''),
+    (SELECT name FROM base_project WHERE id = new.project_id)
+"""
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE base_task_search USING fts5(
+        task_id UNINDEXED, title, description, assigned_to, project,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO base_task_search (rowid, task_id, title, description, assigned_to, project)
+    SELECT t.id, t.id, t.title, t.description, COALESCE(u.username, ''), p.name
+    FROM base_task t
+    JOIN base_project p ON p.id = t.project_id
+    LEFT JOIN account_userprofile u ON u.id = t.assigned_to_id
+    """,
+    f"""
+    CREATE TRIGGER base_task_search_insert AFTER INSERT ON base_task BEGIN
+        INSERT INTO base_task_search (rowid, task_id, title, description, assigned_to, project)
+        VALUES (new.id, {SQLITE_DOCUMENT});
+    END
+    """,
+    f"""
+    CREATE TRIGGER base_task_search_update
+    AFTER UPDATE OF title, description, assigned_to_id, project_id ON base_task BEGIN
+        DELETE FROM base_task_search WHERE rowid = old.id;
+        INSERT INTO base_task_search (rowid, task_id, title, description, assigned_to, project)
+        VALUES (new.id, {SQLITE_DOCUMENT});
+    END
+    """,
+    """
+    CREATE TRIGGER base_task_search_delete AFTER DELETE ON base_task BEGIN
+        DELETE FROM base_task_search WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER base_task_search_project AFTER UPDATE OF name ON base_project BEGIN
+        UPDATE base_task_search SET project = new.name
+        WHERE rowid IN (SELECT id FROM base_task WHERE project_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER base_task_search_assignee AFTER UPDATE OF username ON account_userprofile BEGIN
+        UPDATE base_task_search SET assigned_to = new.username
+        WHERE rowid IN (SELECT id FROM base_task WHERE assigned_to_id = new.id);
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS base_task_search_assignee',
+    'DROP TRIGGER IF EXISTS base_task_search_project',
+    'DROP TRIGGER IF EXISTS base_task_search_delete',
+    'DROP TRIGGER IF EXISTS base_task_search_update',
+    'DROP TRIGGER IF EXISTS base_task_search_insert',
+    'DROP TABLE IF EXISTS base_task_search',
+]
+
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('english', coalesce(t.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(u.username, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(p.name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(t.description, '')), 'C')
+"""
+
+POSTGRES_FORWARD = [
+    """
+    CREATE TABLE base_task_search (
+        task_id bigint PRIMARY KEY REFERENCES base_task (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    'CREATE INDEX base_task_search_document_idx ON base_task_search USING GIN (document)',
+    f"""
+    CREATE FUNCTION base_task_search_refresh(task_ids bigint[]) RETURNS void AS $$
+        INSERT INTO base_task_search (task_id, document)
+        SELECT t.id, {POSTGRES_DOCUMENT}
+        FROM base_task t
+        JOIN base_project p ON p.id = t.project_id
+        LEFT JOIN account_userprofile u ON u.id = t.assigned_to_id
+        WHERE t.id = ANY(task_ids)
+        ON CONFLICT (task_id) DO UPDATE SET document = EXCLUDED.document
+    $$ LANGUAGE sql
+    """,
+    'SELECT base_task_search_refresh(ARRAY(SELECT id FROM base_task))',
+    """
+    CREATE FUNCTION base_task_search_insert_trigger() RETURNS trigger AS $$
+    BEGIN
+        PERFORM base_task_search_refresh(ARRAY(SELECT id FROM new_tasks));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER base_task_search_insert AFTER INSERT ON base_task
+    REFERENCING NEW TABLE AS new_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION base_task_search_insert_trigger()
+    """,
+    # Transition tables rule out UPDATE OF <columns>, so the function skips
+    # rows whose indexed columns did not change (status updates and the like)
+    """
+    CREATE FUNCTION base_task_search_update_trigger() RETURNS trigger AS $$
+    BEGIN
+        PERFORM base_task_search_refresh(ARRAY(
+            SELECT n.id FROM new_tasks n JOIN old_tasks o ON o.id = n.id
+            WHERE (n.title, n.description, n.assigned_to_id, n.project_id)
+                IS DISTINCT FROM (o.title, o.description, o.assigned_to_id, o.project_id)
+        ));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER base_task_search_update AFTER UPDATE ON base_task
+    REFERENCING OLD TABLE AS old_tasks NEW TABLE AS new_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION base_task_search_update_trigger()
+    """,
+    """
+    CREATE FUNCTION base_task_search_project_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF new.name IS DISTINCT FROM old.name THEN
+            PERFORM base_task_search_refresh(ARRAY(SELECT id FROM base_task WHERE project_id = new.id));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER base_task_search_project AFTER UPDATE OF name ON base_project
+    FOR EACH ROW EXECUTE FUNCTION base_task_search_project_trigger()
+    """,
+    """
+    CREATE FUNCTION base_task_search_assignee_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF new.username IS DISTINCT FROM old.username THEN
+            PERFORM base_task_search_refresh(ARRAY(SELECT id FROM base_task WHERE assigned_to_id = new.id));
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER base_task_search_assignee AFTER UPDATE OF username ON account_userprofile
+    FOR EACH ROW EXECUTE FUNCTION base_task_search_assignee_trigger()
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    'DROP TRIGGER IF EXISTS base_task_search_assignee ON account_userprofile',
+    'DROP TRIGGER IF EXISTS base_task_search_project ON base_project',
+    'DROP TRIGGER IF EXISTS base_task_search_update ON base_task',
+    'DROP TRIGGER IF EXISTS base_task_search_insert ON base_task',
+    'DROP FUNCTION IF EXISTS base_task_search_assignee_trigger()',
+    'DROP FUNCTION IF EXISTS base_task_search_project_trigger()',
+    'DROP FUNCTION IF EXISTS base_task_search_update_trigger()',
+    'DROP FUNCTION IF EXISTS base_task_search_insert_trigger()',
+    'DROP FUNCTION IF EXISTS base_task_search_refresh(bigint[])',
+    'DROP TABLE IF EXISTS base_task_search',
+]
+
+SEARCH_SQL = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def run_search_sql(direction):
+    def run(apps, schema_editor):
+        # Other databases fall back to icontains, see base.search
+        statements = SEARCH_SQL.get(schema_editor.connection.vendor, ([], []))[direction]
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_alter_userprofile_email_alter_userprofile_is_active_and_more'),
+        ('base', '0006_task_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchDocument',
+            fields=[
+                ('task', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='base.task')),
+            ],
+            options={
+                'db_table': 'base_task_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(run_search_sql(0), run_search_sql(1)),
+    ]
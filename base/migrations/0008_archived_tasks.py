@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0007_task_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('project_id', models.BigIntegerField()),
+                ('assigned_to_id', models.BigIntegerField(null=True)),
+                ('created_by_id', models.BigIntegerField()),
+                ('due_date', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('content', models.BinaryField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project_id', '-updated_at', '-id'], name='archived_project_updated_idx')],
+            },
+        ),
+    ]
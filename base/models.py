@@ -1,20 +1,112 @@
+import json
+import zlib
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from account.models import UserProfile
 
 
+class AccessQuerySet(models.QuerySet):
+    """
+    Row-level access as queryset filters, so a view decides what a user may
+    reach inside the SELECT that loads the rows. ``access_rules`` maps each
+    scope to the rule of every role: 'all', or the name of a method taking
+    the user; roles without a rule reach nothing.
+    """
+    access_rules = {}
+
+    def for_user(self, user, scope='view'):
+        rule = self.access_rules[scope].get(getattr(user, 'role', None))
+        if rule is None:
+            return self.none()
+        if rule == 'all':
+            return self.all()
+        return getattr(self, rule)(user)
+
+
+class ProjectQuerySet(AccessQuerySet):
+    # CachedProjectResponseMixin shares entries between users, 'view' must
+    # stay the same for every role allowed to read projects
+    access_rules = {
+        'view': {'Admin': 'all', 'Manager': 'all'},
+        'change': {'Admin': 'all'},
+    }
+
+
 # Project model
 class Project(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="created_projects")
 
+    # Task counters kept up to date by base.counters, see recount_project_tasks
+    total_tasks = models.PositiveIntegerField(default=0)
+    pending_tasks = models.PositiveIntegerField(default=0)
+    in_progress_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+    pending_approval_tasks = models.PositiveIntegerField(default=0)
+    overdue_tasks = models.PositiveIntegerField(default=0)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the project list
+            models.Index(fields=['-created_at', '-id'], name='project_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+# Counter column on Project for each task status
+STATUS_COUNTERS = {
+    'Pending': 'pending_tasks',
+    'In Progress': 'in_progress_tasks',
+    'Completed': 'completed_tasks',
+    'Pending Approval': 'pending_approval_tasks',
+}
+PROJECT_COUNTERS = ('total_tasks', 'overdue_tasks', *STATUS_COUNTERS.values())
+
+# Task fields whose previous values base.signals compares against
+TRACKED_FIELDS = ('project_id', 'assigned_to_id', 'status')
+
+
+def counted_state(task):
+    """
+    The part of a task the project counters depend on, or None when those
+    fields were not loaded
+    """
+    loaded = task.__dict__
+    if not all(name in loaded for name in ('project_id', 'status', 'due_date')):
+        return None
+    overdue = task.status != 'Completed' and task.due_date is not None and task.due_date < now()
+    return task.project_id, task.status, overdue
+
+
+def tracked_state(task):
+    loaded = task.__dict__
+    return {name: loaded[name] for name in TRACKED_FIELDS if name in loaded}
+
+
+class TaskQuerySet(AccessQuerySet):
+    access_rules = {
+        # Lists, exports and sync
+        'view': {'Admin': 'all', 'Manager': 'all', 'User': 'assigned_to'},
+        # Detail, update and delete, single or bulk
+        'change': {'Admin': 'assigned_to', 'Manager': 'assigned_to', 'User': 'assigned_to'},
+        'approve': {'Manager': 'all'},
+    }
+
+    def assigned_to(self, user):
+        return self.filter(assigned_to_id=user.id)
+
+
 # Task model
 class Task(models.Model):
     STATUS_CHOICES = [
@@ -41,5 +133,145 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the project counters currently include for this task
+        instance._counted_state = counted_state(instance)
+        # and who currently sees it, for tombstones and task events
+        instance._loaded_state = tracked_state(instance)
+        return instance
+
+    class Meta:
+        indexes = [
+            # Task list of regular users, optionally filtered by status
+            models.Index(fields=['assigned_to', 'status'], name='task_assignee_status_idx'),
+            # Per-project completion counts
+            models.Index(fields=['project', 'status'], name='task_project_status_idx'),
+            # Keyset pagination of the full task list
+            models.Index(fields=['-updated_at', '-id'], name='task_updated_id_idx'),
+            # Delta sync of regular users (TaskChangesView)
+            models.Index(fields=['assigned_to', 'updated_at', 'id'], name='task_assignee_updated_idx'),
+            # PendingTasksView, ordered the way it paginates
+            models.Index(
+                fields=['due_date', 'id'],
+                condition=Q(status='Pending Approval'),
+                name='task_pending_approval_idx',
+            ),
+            # task_deletion command
+            models.Index(
+                fields=['updated_at'],
+                condition=Q(status='Completed'),
+                name='task_completed_updated_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class TaskTombstone(models.Model):
+    """
+    A task that disappeared from someone's view, either deleted or assigned
+    to someone else, so delta sync clients can drop it. ``assigned_to`` is
+    the user who could see the task; tombstones older than
+    TASK_TOMBSTONE_DAYS are pruned by the task_deletion command.
+    """
+    task_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    assigned_to_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['assigned_to_id', 'id'], name='tombstone_assignee_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'Task {self.task_id}'
+
+
+class ArchivedTaskQuerySet(AccessQuerySet):
+    access_rules = {
+        'view': {'Admin': 'all', 'Manager': 'all', 'User': 'assigned_to'},
+    }
+
+    def assigned_to(self, user):
+        return self.filter(assigned_to_id=user.id)
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of the live table by task_deletion, see
+    base.archive. Relations are plain ids so archived rows outlive their
+    project and users, and the text fields are kept zlib-compressed in
+    ``content``. Only completed tasks are archived.
+    """
+    status = 'Completed'
+
+    id = models.BigIntegerField(primary_key=True)
+    project_id = models.BigIntegerField()
+    assigned_to_id = models.BigIntegerField(null=True)
+    created_by_id = models.BigIntegerField()
+    due_date = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    content = models.BinaryField()
+
+    objects = ArchivedTaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Archive reads by project and completion date range
+            models.Index(fields=['project_id', '-updated_at', '-id'], name='archived_project_updated_idx'),
+        ]
+
+    @classmethod
+    def from_task(cls, task):
+        content = {'title': task.title, 'description': task.description, 'priority': task.priority}
+        return cls(
+            id=task.pk,
+            project_id=task.project_id,
+            assigned_to_id=task.assigned_to_id,
+            created_by_id=task.created_by_id,
+            due_date=task.due_date,
+            created_at=task.created_at,
+            updated_at=task.updated_at,
+            content=zlib.compress(json.dumps(content, separators=(',', ':')).encode()),
+        )
+
+    @cached_property
+    def content_data(self):
+        return json.loads(zlib.decompress(self.content))
+
+    @property
+    def title(self):
+        return self.content_data['title']
+
+    @property
+    def description(self):
+        return self.content_data['description']
+
+    @property
+    def priority(self):
+        return self.content_data['priority']
+
     def __str__(self):
         return self.title
+
+
+class TaskSearchDocument(models.Model):
+    """
+    Row of the full-text index of a task, see base.search. The table is
+    created and kept in sync by database triggers, never written by Django.
+    """
+    task = models.OneToOneField(
+        Task, primary_key=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='search_document'
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'base_task_search'
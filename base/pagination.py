@@ -0,0 +1,193 @@
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite ordering such as
+    ``('-updated_at', '-id')``. The cursor carries the ordering values of the
+    last row served, so every page is a single indexed range scan with no
+    OFFSET and no COUNT(*), however deep the client scrolls. The last field
+    of ``ordering`` must be unique.
+    """
+
+    ordering = ('-id',)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(queryset)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            try:
+                position = self.parse_position(queryset, self.ordering, position)
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        ordering = self.reversed_ordering() if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek(ordering, position))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # Moving backwards, the rows past the page are the ones before it
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first = self.position_of(rows[0]) if rows else None
+        self.last = self.position_of(rows[-1]) if rows else None
+        if not rows and position is not None:
+            # Empty page reached from a cursor, keep the client where it was
+            self.first = self.last = position
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first is None:
+            return None
+        return self.encode_cursor(self.first, reverse=True)
+
+    def reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def position_of(self, instance):
+        values = []
+        for field in self.ordering:
+            # Model instances, or values() rows on the fast list path (base.rows)
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    @staticmethod
+    def parse_position(queryset, ordering, position):
+        """
+        ``position`` as the Python values of the ``ordering`` fields (or
+        annotations) of ``queryset``. Raises ValueError when it does not fit
+        them, so tampered cursors never reach the database.
+        """
+        if not isinstance(position, list) or len(position) != len(ordering):
+            raise ValueError('Position does not match the ordering')
+        values = []
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            annotation = queryset.query.annotations.get(name)
+            model_field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+            try:
+                value = model_field.clean(value, None)
+            except (ValidationError, TypeError) as exc:
+                raise ValueError(f'Invalid {name} in position') from exc
+            # Non-editable fields skip the null check of clean()
+            if value is None:
+                raise ValueError(f'Invalid {name} in position')
+            values.append(value)
+        return values
+
+    @staticmethod
+    def seek(ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``, i.e. the expanded
+        form of the row comparison ``(a, b, c) > (x, y, z)``.
+        """
+        clauses = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                prev.lstrip('-'): position[prev_index]
+                for prev_index, prev in enumerate(ordering[:index])
+            }
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': position[index]}))
+        return reduce(lambda left, right: left | right, clauses)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+
+class TaskPagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+    def get_ordering(self, queryset):
+        # Best full-text matches first when base.search ranked the tasks
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', 'id')
+        return self.ordering
+
+
+class DueDatePagination(KeysetPagination):
+    ordering = ('due_date', 'id')
+
+
+class ArchivePagination(KeysetPagination):
+    ordering = ('-updated_at', '-id')
+
+
+class ProjectPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .conditional import make_validators, with_validators
+
+logger = logging.getLogger(__name__)
+
+
+class ProjectResponseCache:
+    """
+    Serialized project payloads in the shared Django cache (Redis), keyed by
+    a per-project generation counter. Every write to a project or to one of
+    its tasks bumps the generation, which orphans all cached payloads of the
+    project at once; orphans simply expire after ``timeout``.
+
+    Concurrent misses on the same entry are coalesced: the first one takes a
+    short lock and computes, the others poll for its result for up to
+    ``lock_wait`` seconds before computing themselves.
+
+    While the shared cache is unreachable responses are computed every time
+    and failed bumps are logged, their projects' entries are served until
+    they expire once it is back.
+    """
+
+    key_prefix = 'project_response'
+    stats_keys = ('hits', 'misses', 'coalesced')
+
+    def __init__(self, timeout=300, lock_timeout=10, lock_wait=2.0, poll_interval=0.01, stats_interval=5):
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self.stats_interval = stats_interval
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stats_flushed_at = time.monotonic()
+
+    def generation_key(self, project_id):
+        return f'{self.key_prefix}:{project_id}:generation'
+
+    def generation(self, project_id):
+        key = self.generation_key(project_id)
+        generation = cache.get(key)
+        if generation is None:
+            # Seeded from the clock so a lost counter can never line up with
+            # the generation of entries that are still cached
+            cache.add(key, time.time_ns(), timeout=None)
+            generation = cache.get(key)
+        return generation
+
+    def entry_key(self, project_id, name):
+        return f'{self.key_prefix}:{project_id}:{self.generation(project_id)}:{name}'
+
+    def invalidate(self, project_ids):
+        """
+        Bump the generation of ``project_ids`` once the current transaction
+        commits, so no reader can cache the pre-commit state under the new
+        generation.
+        """
+        project_ids = {project_id for project_id in project_ids if project_id is not None}
+        if project_ids:
+            transaction.on_commit(lambda: self._bump(project_ids))
+
+    def _bump(self, project_ids):
+        for project_id in project_ids:
+            key = self.generation_key(project_id)
+            try:
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    cache.add(key, time.time_ns(), timeout=None)
+            except Exception as exc:
+                logger.error('Could not invalidate the cached responses of project %s: %s', project_id, exc)
+
+    def get_or_set(self, project_id, name, compute):
+        """
+        The cached entry ``name`` of ``project_id``, computing and storing
+        it with ``compute()`` on a miss. Returns (entry, hit).
+        """
+        try:
+            key = self.entry_key(project_id, name)
+            entry = cache.get(key)
+            if entry is not None:
+                self.record('hits')
+                return entry, True
+
+            lock_key = f'{key}:lock'
+            if not cache.add(lock_key, 1, timeout=self.lock_timeout):
+                deadline = time.monotonic() + self.lock_wait
+                while time.monotonic() < deadline:
+                    time.sleep(self.poll_interval)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        self.record('coalesced')
+                        return entry, True
+                lock_key = None
+        except Exception as exc:
+            logger.warning('Could not read the cached responses of project %s: %s', project_id, exc)
+            return compute(), False
+
+        self.record('misses')
+        try:
+            entry = compute()
+            self.safely(cache.set, key, entry, timeout=self.timeout)
+        finally:
+            if lock_key is not None:
+                self.safely(cache.delete, lock_key)
+        return entry, False
+
+    @staticmethod
+    def safely(method, *args, **kwargs):
+        """
+        ``method(*args, **kwargs)``, logging instead of raising cache errors
+        """
+        try:
+            return method(*args, **kwargs)
+        except Exception as exc:
+            logger.warning('Project response cache %s failed: %s', method.__name__, exc)
+
+    def record(self, outcome):
+        """
+        Count ``outcome`` locally, pushing the counts to the shared cache at
+        most every ``stats_interval`` seconds to keep the hit path cheap
+        """
+        with self._stats_lock:
+            self._stats[outcome] += 1
+            if time.monotonic() - self._stats_flushed_at < self.stats_interval:
+                return
+            pending, self._stats = self._stats, Counter()
+            self._stats_flushed_at = time.monotonic()
+        self.flush_stats(pending)
+
+    def flush_stats(self, pending=None):
+        if pending is None:
+            with self._stats_lock:
+                pending, self._stats = self._stats, Counter()
+        for outcome, count in pending.items():
+            key = f'{self.key_prefix}:stats:{outcome}'
+            if not self.safely(cache.add, key, count, timeout=None):
+                self.safely(cache.incr, key, count)
+
+    def stats(self):
+        """
+        Shared hit/miss counts of every process plus this process' unflushed ones
+        """
+        shared = cache.get_many([f'{self.key_prefix}:stats:{outcome}' for outcome in self.stats_keys])
+        with self._stats_lock:
+            local = Counter(self._stats)
+        stats = {
+            outcome: shared.get(f'{self.key_prefix}:stats:{outcome}', 0) + local[outcome]
+            for outcome in self.stats_keys
+        }
+        served = stats['hits'] + stats['coalesced']
+        requests = served + stats['misses']
+        stats['hit_rate'] = served / requests if requests else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = Counter()
+        cache.delete_many([f'{self.key_prefix}:stats:{outcome}' for outcome in self.stats_keys])
+
+
+project_responses = ProjectResponseCache(
+    timeout=getattr(settings, 'PROJECT_RESPONSE_CACHE_TIMEOUT', 300),
+    lock_timeout=getattr(settings, 'PROJECT_RESPONSE_CACHE_LOCK_TIMEOUT', 10),
+    lock_wait=getattr(settings, 'PROJECT_RESPONSE_CACHE_LOCK_WAIT', 2.0),
+)
+
+
+class CachedProjectResponseMixin:
+    """
+    Serves GETs of a project view from project_responses. The entry holds
+    the serialized payload and the validator state of ConditionalObjectMixin,
+    so hits, including 304s, are answered without touching the database.
+    """
+
+    response_cache_name = None
+
+    def get(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        entry, hit = project_responses.get_or_set(
+            self.kwargs[lookup_url_kwarg], self.response_cache_name, self.cache_entry
+        )
+        etag, last_modified = make_validators(request.path, request.user, entry['state'])
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = with_validators(Response(entry['data']), etag, last_modified)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def cache_entry(self):
+        instance = self.get_object()
+        return {
+            'data': self.get_serializer(instance).data,
+            'state': self.object_state(instance),
+        }
@@ -0,0 +1,186 @@
+import datetime
+from collections import defaultdict
+from functools import lru_cache
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+
+from account.profiler import serializer_timer
+
+# Fields whose to_representation returns database values unchanged
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer output produced by orjson, byte for byte as long as the
+    data holds no floats (orjson writes 1e16 where json writes 1e+16).
+    Datetimes and other non-JSON types still go through the DRF encoder;
+    indented responses (browsable API, ``indent=`` media type parameter)
+    and data orjson refuses go through the standard renderer.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict javascript subset as JSONRenderer
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def format_datetime(value, tz):
+    """
+    DateTimeField.to_representation with the default ISO 8601 format
+    """
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+class RowSerializer:
+    """
+    Read-only twin of a ModelSerializer for list responses: the rows are
+    fetched with values(), related objects included through joins, and
+    turned into the serializer's exact output by one generated function,
+    without model instances or the per-field serializer pipeline. Nested
+    ``many=True`` serializers cost one extra query for the whole page.
+    """
+
+    def __init__(self, serializer, model):
+        self.model = model
+        self.paths = []
+        self.converters = {}
+        self.nested = []
+        expression = self.compile_fields(serializer, model, '')
+        source = f'def serialize(rows, nested, tz):\n    return [{expression} for row in rows]\n'
+        namespace = dict(self.converters, format_datetime=format_datetime)
+        exec(compile(source, f'<{type(serializer).__name__} rows>', 'exec'), namespace)
+        self.function = namespace['serialize']
+
+    def compile_fields(self, serializer, model, prefix):
+        items = []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(f'{field.field_name}: only plain model field sources are supported')
+            path = prefix + field.source
+            items.append(f'{field.field_name!r}: {self.compile_field(field, model, path)}')
+        return '{' + ', '.join(items) + '}'
+
+    def compile_field(self, field, model, path):
+        if isinstance(field, serializers.ListSerializer):
+            if '__' in path:
+                raise ImproperlyConfigured(f'{path}: nested many=True serializers only at the top level')
+            relation = model._meta.get_field(field.source)
+            child = RowSerializer(field.child, relation.related_model)
+            self.nested.append((child, relation.field.name))
+            self.add_path('pk')
+            return f"nested[{len(self.nested) - 1}].get(row['pk'], [])"
+
+        if isinstance(field, serializers.BaseSerializer):
+            related_model = model._meta.get_field(field.source).related_model
+            self.add_path(path)
+            children = self.compile_fields(field, related_model, f'{path}__')
+            return f'None if row[{path!r}] is None else {children}'
+
+        self.add_path(path)
+        value = f'row[{path!r}]'
+        if isinstance(field, PLAIN_FIELDS) and not isinstance(field, serializers.ManyRelatedField):
+            return value
+        if (
+            isinstance(field, serializers.DateTimeField)
+            and getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() == ISO_8601
+            and not hasattr(field, 'timezone')
+        ):
+            return f'None if {value} is None else format_datetime({value}, tz)'
+        # Anything else through the field itself, still skipping the rest of the pipeline
+        name = f'field_{len(self.converters)}'
+        self.converters[name] = field.to_representation
+        return f'None if {value} is None else {name}({value})'
+
+    def add_path(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+
+    def values(self, queryset, *extra):
+        """
+        ``queryset`` as the values() rows serialize() expects, plus the
+        ``extra`` fields or annotations (e.g. those a paginator orders by)
+        """
+        fields = list(dict.fromkeys([*self.paths, *extra]))
+        return queryset.prefetch_related(None).values(*fields)
+
+    def serialize(self, rows):
+        with serializer_timer():
+            rows = list(rows)
+            nested = [self.fetch_nested(child, field, rows) for child, field in self.nested]
+            tz = timezone.get_current_timezone() if settings.USE_TZ else None
+            return self.function(rows, nested, tz)
+
+    @staticmethod
+    def fetch_nested(child, field, rows):
+        """
+        Serialized related rows by the pk of their parent row, in the order
+        related_lookups prefetches them
+        """
+        by_parent = defaultdict(list)
+        if not rows:
+            return by_parent
+        queryset = child.model._default_manager.filter(**{f'{field}__in': [row['pk'] for row in rows]})
+        related = list(child.values(queryset.order_by(*(child.model._meta.ordering or ['pk'])), field))
+        for row, data in zip(related, child.serialize(related)):
+            by_parent[row[field]].append(data)
+        return by_parent
+
+
+@lru_cache(maxsize=None)
+def row_serializer(serializer_class, model):
+    return RowSerializer(serializer_class(), model)
+
+
+class FastListMixin:
+    """
+    Serves GET lists through the view's RowSerializer and ORJSONRenderer
+    instead of building model instances and running the serializer on each,
+    same JSON output. Switched off with FAST_LIST_RESPONSES = False.
+    """
+    renderer_classes = [
+        ORJSONRenderer if renderer is JSONRenderer else renderer for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    ]
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'FAST_LIST_RESPONSES', True):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = row_serializer(self.get_serializer_class(), queryset.model)
+        ordering = self.paginator.get_ordering(queryset) if self.paginator is not None else ()
+        page = self.paginate_queryset(rows.values(queryset, *(field.lstrip('-') for field in ordering)))
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(rows.values(queryset)))
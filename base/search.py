@@ -0,0 +1,113 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+# Full-text index of tasks, maintained by database triggers (see migration
+# 0007_task_search): an FTS5 table on SQLite, a tsvector table with a GIN
+# index on PostgreSQL
+SEARCH_TABLE = 'base_task_search'
+
+# bm25 weights of the FTS5 columns task_id, title, description, assigned_to, project
+FTS5_WEIGHTS = (0.0, 10.0, 1.0, 2.0, 2.0)
+
+TSQUERY = "websearch_to_tsquery('english', %s)"
+
+# The row trigger of migration 0007 that indexes every inserted task on SQLite
+SQLITE_INSERT_TRIGGER = 'base_task_search_insert'
+
+
+def fts5_query(text):
+    """
+    FTS5 MATCH expression requiring every word of ``text``, the last one as
+    a prefix so partially typed words already match
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+@contextmanager
+def deferred_search_index(using='default'):
+    """
+    Index the tasks inserted inside the block with one statement at the end
+    rather than row by row, for bulk loads run outside a transaction. Only
+    SQLite indexes per row; the PostgreSQL trigger already works per
+    statement.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s", [SQLITE_INSERT_TRIGGER])
+        trigger = cursor.fetchone()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM base_task')
+        last_id = cursor.fetchone()[0]
+        if trigger:
+            cursor.execute(f'DROP TRIGGER "{SQLITE_INSERT_TRIGGER}"')
+    try:
+        yield
+    finally:
+        if trigger:
+            with connection.cursor() as cursor:
+                cursor.execute(trigger[0])
+                # Merging segments while filling costs more than once afterwards
+                cursor.execute(f"""INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}", rank) VALUES ('automerge', 0)""")
+                cursor.execute(
+                    f"""
+                    INSERT INTO "{SEARCH_TABLE}" (rowid, task_id, title, description, assigned_to, project)
+                    SELECT t.id, t.id, t.title, t.description, COALESCE(u.username, ''), p.name
+                    FROM base_task t
+                    JOIN base_project p ON p.id = t.project_id
+                    LEFT JOIN account_userprofile u ON u.id = t.assigned_to_id
+                    WHERE t.id > %s
+                    """,
+                    [last_id],
+                )
+                cursor.execute(f"""INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}", rank) VALUES ('automerge', 4)""")
+
+
+def search_tasks(queryset, text):
+    """
+    Tasks of ``queryset`` matching ``text`` in their title, description,
+    assignee username or project name, annotated with ``search_rank``
+    (higher is better)
+    """
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        match = fts5_query(text)
+        if match is None:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in FTS5_WEIGHTS)
+        matches = RawSQL(f'"{SEARCH_TABLE}" MATCH %s', [match], output_field=BooleanField())
+        rank = RawSQL(f'-bm25("{SEARCH_TABLE}", {weights})', [], output_field=FloatField())
+    elif vendor == 'postgresql':
+        matches = RawSQL(f'"{SEARCH_TABLE}"."document" @@ {TSQUERY}', [text], output_field=BooleanField())
+        rank = RawSQL(f'ts_rank("{SEARCH_TABLE}"."document", {TSQUERY})', [text], output_field=FloatField())
+    else:
+        return queryset.filter(
+            Q(title__icontains=text) | Q(description__icontains=text)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    # The inner join on the index table is what the raw expressions refer to
+    return queryset.filter(search_document__isnull=False).filter(matches).annotate(search_rank=rank)
+
+
+class TaskSearchFilter(BaseFilterBackend):
+    """
+    ``?q=`` full-text search, ranked by TaskPagination
+    """
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search_tasks(queryset, text)
@@ -0,0 +1,334 @@
+import multiprocessing
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+from itertools import accumulate
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from account.models import EmailCode, UserProfile
+from .counters import recount_projects
+from .models import PROJECT_COUNTERS, Project, Task
+from .search import deferred_search_index
+
+SEED_PASSWORD = 'password'
+
+# Relative weight of each role among the seeded users
+ROLE_MIX = {'User': 90, 'Manager': 8, 'Admin': 2}
+
+# Relative weight of each status and priority among the seeded tasks
+TASK_STATUS_MIX = {'Pending': 35, 'In Progress': 25, 'Completed': 30, 'Pending Approval': 10}
+PRIORITY_MIX = {'Low': 30, 'Medium': 50, 'High': 20}
+
+# Due dates per status, in days from now: finished work is mostly past due,
+# open work mostly ahead with an overdue tail
+DUE_DATE_DAYS = {'Pending': (-10, 60), 'In Progress': (-5, 30), 'Completed': (-90, 10), 'Pending Approval': (-3, 20)}
+
+# Zipf exponents of tasks per project and per assignee: a few big projects
+# and busy people, a long tail of small ones
+PROJECT_SKEW = 0.9
+ASSIGNEE_SKEW = 0.7
+
+# Share of seeded users still waiting for their signup email code, and of
+# tasks nobody is assigned to
+INACTIVE_USER_SHARE = 0.05
+UNASSIGNED_TASK_SHARE = 0.05
+
+# How far back users joined, and projects and tasks were created, in days
+HISTORY_DAYS = 365
+
+TASK_VERBS = ('Review', 'Update', 'Fix', 'Design', 'Test', 'Deploy', 'Document', 'Plan', 'Migrate', 'Refactor')
+TASK_SUBJECTS = (
+    'login page', 'invoice export', 'search index', 'billing report', 'onboarding flow',
+    'API client', 'dashboard', 'mobile app', 'release notes', 'database backup',
+)
+
+USER_FIELDS = (
+    'username', 'email', 'password', 'role', 'is_active', 'is_staff', 'is_superuser',
+    'first_name', 'last_name', 'date_joined',
+)
+# Counters start at zero, recount_projects fills them in
+PROJECT_FIELDS = ('name', 'description', 'created_by', 'created_at', 'updated_at', *PROJECT_COUNTERS)
+TASK_FIELDS = (
+    'title', 'description', 'due_date', 'priority', 'status', 'project', 'assigned_to', 'created_by',
+    'created_at', 'updated_at',
+)
+EMAIL_CODE_FIELDS = ('mail_code', 'profile', 'is_active')
+
+
+def default_counts(tasks):
+    """
+    (users, projects) in proportion to ``tasks``
+    """
+    return max(20, tasks // 100), max(10, tasks // 500)
+
+
+def skewed(values, exponent, rng):
+    """
+    ``values`` in random order with the cumulative Zipf weights rng.choices
+    takes, so the first few get most of the picks
+    """
+    values = list(values)
+    rng.shuffle(values)
+    return values, list(accumulate(1 / rank ** exponent for rank in range(1, len(values) + 1)))
+
+
+def weighted(mix):
+    return list(mix), list(accumulate(mix.values()))
+
+
+class Clock:
+    """
+    Database values of the times ``minutes`` away from ``now``, rounded to
+    ``step`` minutes so each is adapted once rather than once per row
+    """
+
+    def __init__(self, now, using, step=15):
+        self.now = now.replace(minute=now.minute - now.minute % step, second=0, microsecond=0)
+        self.adapt = connections[using].ops.adapt_datetimefield_value
+        self.step = step
+        self.values = {}
+
+    def __call__(self, minutes):
+        steps = minutes // self.step
+        value = self.values.get(steps)
+        if value is None:
+            value = self.values[steps] = self.adapt(self.now + timedelta(minutes=steps * self.step))
+        return value
+
+
+@lru_cache(maxsize=None)
+def clock_for(now, using):
+    # Shared by the chunks a process generates
+    return Clock(now, using)
+
+
+def chunk_rng(seed, table, index):
+    # Every chunk draws from its own stream, the data does not depend on the worker count
+    return random.Random(f'{seed}:{table}:{index}')
+
+
+def user_rows(chunk):
+    index, start, count, context = chunk
+    rng = chunk_rng(context['seed'], 'users', index)
+    clock = clock_for(context['now'], context['using'])
+    roles, role_weights = weighted(ROLE_MIX)
+    history = HISTORY_DAYS * 2 * 1440
+    rows = []
+    for number in range(start, start + count):
+        rows.append((
+            f'user{number}', f'user{number}@example.com', context['password'],
+            rng.choices(roles, cum_weights=role_weights)[0], rng.random() >= INACTIVE_USER_SHARE,
+            False, False, '', '', clock(-rng.randrange(history)),
+        ))
+    return rows
+
+
+def project_rows(chunk):
+    index, start, count, context = chunk
+    rng = chunk_rng(context['seed'], 'projects', index)
+    clock = clock_for(context['now'], context['using'])
+    history = HISTORY_DAYS * 1440
+    rows = []
+    for number in range(start, start + count):
+        created = -rng.randrange(history)
+        rows.append((
+            f'Project {number}', f'Seeded project {number}', rng.choice(context['creators']),
+            clock(created), clock(rng.randint(created, 0)), *[0] * len(PROJECT_COUNTERS),
+        ))
+    return rows
+
+
+def task_rows(chunk):
+    index, start, count, context = chunk
+    rng = chunk_rng(context['seed'], 'tasks', index)
+    clock = clock_for(context['now'], context['using'])
+    statuses, status_weights = weighted(TASK_STATUS_MIX)
+    priorities, priority_weights = weighted(PRIORITY_MIX)
+    projects, project_weights = context['projects']
+    assignees, assignee_weights = context['assignees']
+    creators = context['creators']
+    history = HISTORY_DAYS * 1440
+
+    due_minutes = {
+        status: (earliest * 1440, (latest - earliest) * 1440) for status, (earliest, latest) in DUE_DATE_DAYS.items()
+    }
+    # Drawn a chunk at a time, per row calls to the generator dominate otherwise
+    columns = zip(
+        range(start, start + count),
+        rng.choices(projects, cum_weights=project_weights, k=count),
+        rng.choices(assignees, cum_weights=assignee_weights, k=count),
+        rng.choices(statuses, cum_weights=status_weights, k=count),
+        rng.choices(priorities, cum_weights=priority_weights, k=count),
+        rng.choices(creators, k=count),
+        rng.choices(TASK_VERBS, k=count),
+        rng.choices(TASK_SUBJECTS, k=count),
+    )
+    random_share = rng.random
+    rows = []
+    for number, project_id, assignee_id, status, priority, creator_id, verb, subject in columns:
+        earliest, span = due_minutes[status]
+        created = -int(random_share() * history)
+        rows.append((
+            f'{verb} {subject} #{number}', f'{verb} the {subject} of project {project_id}.',
+            clock(earliest + int(random_share() * span)), priority, status, project_id,
+            None if random_share() < UNASSIGNED_TASK_SHARE else assignee_id,
+            creator_id, clock(created), clock(int(created * random_share())),
+        ))
+    return rows
+
+
+def email_code_rows(chunk):
+    index, start, count, context = chunk
+    rng = chunk_rng(context['seed'], 'email_codes', index)
+    # Every signup got a code, verified users already used theirs
+    return [(str(rng.randint(1000, 9999)), user_id, not is_active) for user_id, is_active in context['users']]
+
+
+def insert_rows(model, fields, rows):
+    """
+    Write ``rows`` (tuples of database values for ``fields``) with one
+    executemany in one transaction
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+@contextmanager
+def suspended_indexes(model):
+    """
+    Drop the secondary indexes of ``model`` (foreign keys and Meta.indexes)
+    for the block and build them again afterwards, once over all rows
+    instead of one insert at a time
+    """
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+    names = [
+        name for name, constraint in constraints.items()
+        if constraint['index'] and not constraint['primary_key'] and not constraint['unique']
+    ]
+    with connection.schema_editor() as schema_editor:
+        # What migrate would create for the table, the same names included
+        statements = schema_editor._model_indexes_sql(model)
+        for name in names:
+            schema_editor.execute(schema_editor._delete_index_sql(model, name))
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as schema_editor:
+            for statement in statements:
+                schema_editor.execute(statement)
+
+
+class Seeder:
+    """
+    Loads synthetic users, projects, tasks and email codes with realistic
+    distributions (see the mixes above). Rows are generated as tuples of
+    database values, by ``workers`` processes when given, and written
+    ``batch_size`` at a time without model instances or signals, so the
+    create_user_profile signup code of account.signals is neither printed
+    nor mailed; the email codes are seeded directly. The data only depends
+    on ``seed``.
+    """
+
+    def __init__(self, seed=0, batch_size=50000, workers=0, password=SEED_PASSWORD, progress=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.workers = workers
+        # Hashed once for every user, the hasher is deliberately slow
+        self.password = make_password(password)
+        self.progress = progress or (lambda table, count: None)
+        self.now = timezone.now()
+
+    def chunks(self, model, count, context):
+        context = {'seed': self.seed, 'now': self.now, 'using': router.db_for_write(model), **context}
+        return [
+            (index, start, min(self.batch_size, count - start), context)
+            for index, start in enumerate(range(0, count, self.batch_size))
+        ]
+
+    def load(self, model, fields, generate, chunks):
+        """
+        Generate and write ``chunks``, the writes overlapping the generation
+        of the next chunks when there are workers
+        """
+        written = 0
+        if self.workers and len(chunks) > 1:
+            with multiprocessing.Pool(self.workers, initializer=django.setup) as pool:
+                for rows in pool.imap(generate, chunks):
+                    insert_rows(model, fields, rows)
+                    written += len(rows)
+                    self.progress(model._meta.verbose_name_plural, written)
+        else:
+            for chunk in chunks:
+                rows = generate(chunk)
+                insert_rows(model, fields, rows)
+                written += len(rows)
+                self.progress(model._meta.verbose_name_plural, written)
+        return written
+
+    def seed_users(self, count):
+        last_id = UserProfile.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        # Numbered after the existing ids, so usernames never collide
+        chunks = [
+            (index, start + last_id + 1, size, context)
+            for index, start, size, context in self.chunks(UserProfile, count, {'password': self.password})
+        ]
+        self.load(UserProfile, USER_FIELDS, user_rows, chunks)
+        users = list(
+            UserProfile.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'role', 'is_active')
+        )
+        codes = [(user_id, is_active) for user_id, _, is_active in users]
+        chunks = [
+            (index, start, size, {**context, 'users': codes[start:start + size]})
+            for index, start, size, context in self.chunks(EmailCode, len(codes), {})
+        ]
+        self.load(EmailCode, EMAIL_CODE_FIELDS, email_code_rows, chunks)
+        return users
+
+    def seed_projects(self, count, creators):
+        last_id = Project.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        self.load(Project, PROJECT_FIELDS, project_rows, self.chunks(Project, count, {'creators': creators}))
+        return list(Project.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True))
+
+    def seed_tasks(self, count, projects, assignees, creators):
+        rng = random.Random(f'{self.seed}:weights')
+        context = {
+            'projects': skewed(projects, PROJECT_SKEW, rng),
+            'assignees': skewed(assignees, ASSIGNEE_SKEW, rng),
+            'creators': creators,
+        }
+        chunks = self.chunks(Task, count, context)
+        using = router.db_for_write(Task)
+        # Indexing afterwards pays off when the load at least doubles the
+        # table, and needs schema changes outside of a transaction
+        if count < Task.objects.count() or connections[using].in_atomic_block:
+            return self.load(Task, TASK_FIELDS, task_rows, chunks)
+        # The generated references are valid by construction, checking
+        # them row by row only slows SQLite down
+        with deferred_search_index(using), suspended_indexes(Task), connections[using].constraint_checks_disabled():
+            return self.load(Task, TASK_FIELDS, task_rows, chunks)
+
+    def run(self, users, projects, tasks):
+        """
+        Seed the tables, then repair the project task counters the bulk
+        inserts bypassed. Returns the seeded users as (id, role, is_active).
+        """
+        seeded_users = self.seed_users(users)
+        active = [user_id for user_id, _, is_active in seeded_users if is_active]
+        creators = [user_id for user_id, role, is_active in seeded_users if is_active and role != 'User'] or active
+        project_ids = self.seed_projects(projects, creators)
+        if tasks:
+            self.seed_tasks(tasks, project_ids, active, creators)
+        recount_projects()
+        return seeded_users
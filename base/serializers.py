@@ -1,15 +1,81 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 
-from account.serializers import UserRegistrationSerializer
-from .models import Task, Project
+from account.models import UserProfile
+from account.serializers import CachedUserSerializer
+from account.user_cache import user_cache
+from .counters import apply_task_changes
+from .events import change_kind, moved_from, task_event, task_events
+from .models import ArchivedTask, Task, Project, counted_state, tracked_state
+from .response_cache import project_responses
+from .sync import record_tombstones
 from django.utils.timezone import now
 
 
+class CreatedByListSerializer(serializers.ListSerializer):
+    """
+    Resolves the creators of every item on the page with one user_cache
+    lookup, unless the queryset already joined them
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if items:
+            created_by = items[0]._meta.get_field('created_by')
+            user_cache.get_many({item.created_by_id for item in items if not created_by.is_cached(item)})
+        return super().to_representation(items)
+
+
+@lru_cache(maxsize=None)
+def related_lookups(serializer_class, model):
+    """
+    The select_related paths and Prefetch objects needed to serialize
+    ``model`` instances with ``serializer_class`` without extra queries
+    """
+    return _related_lookups(serializer_class(), model)
+
+
+def _related_lookups(serializer, model, prefix=''):
+    select_related, prefetch_related = [], []
+    for field in serializer.fields.values():
+        if not isinstance(field, serializers.BaseSerializer) or '.' in field.source or field.source == '*':
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = prefix + field.source
+        related_model = model_field.related_model
+        if isinstance(field, serializers.ListSerializer):
+            child_select, child_prefetch = _related_lookups(field.child, related_model)
+            # In a stable order, the same one base.rows uses
+            queryset = related_model._default_manager.select_related(
+                *child_select
+            ).prefetch_related(*child_prefetch).order_by(*(related_model._meta.ordering or ['pk']))
+            prefetch_related.append(Prefetch(path, queryset=queryset))
+        else:
+            select_related.append(path)
+            child_select, child_prefetch = _related_lookups(field, related_model, prefix=f'{path}__')
+            select_related.extend(child_select)
+            prefetch_related.extend(child_prefetch)
+
+    return select_related, prefetch_related
+
+
 class TaskSerializer(serializers.ModelSerializer):
-    created_by = UserRegistrationSerializer(read_only=True)
+    created_by = CachedUserSerializer(read_only=True)
 
     class Meta:
         model = Task
+        list_serializer_class = CreatedByListSerializer
         fields = [
             "id",
             "title",
@@ -43,9 +109,9 @@ class TaskSerializer(serializers.ModelSerializer):
         user = self.context["user"]
         status = validated_data.pop("status")
         if user.is_user and status != "In Progress":
-            task = Task(**validated_data, created_by=user)
+            task = Task(**validated_data, created_by_id=user.id)
         else:
-            task = Task(**validated_data, created_by=user, status=status)
+            task = Task(**validated_data, created_by_id=user.id, status=status)
         task.save()
         return task
 
@@ -68,12 +134,183 @@ class TaskSerializer(serializers.ModelSerializer):
         return instance
 
 
+class BulkTaskListSerializer(serializers.ListSerializer):
+    """
+    Validates every referenced project and assignee with one IN query each
+    and writes the whole batch with bulk_create/bulk_update in a single
+    transaction. Applies the same role rules as TaskSerializer.
+    """
+
+    def to_internal_value(self, data):
+        # Errors raised here keep the per-item list shape of field errors
+        attrs = super().to_internal_value(data)
+        project_ids = {item['project'] for item in attrs if 'project' in item}
+        user_ids = {item['assigned_to'] for item in attrs if item.get('assigned_to') is not None}
+        projects = set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+        users = set(UserProfile.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+        seen_ids = set()
+        errors = []
+        for item in attrs:
+            item_errors = {}
+            if 'project' in item and item['project'] not in projects:
+                item_errors['project'] = [f"Invalid pk \"{item['project']}\" - object does not exist."]
+            if item.get('assigned_to') is not None and item['assigned_to'] not in users:
+                item_errors['assigned_to'] = [f"Invalid pk \"{item['assigned_to']}\" - object does not exist."]
+            if 'id' in item:
+                if item['id'] in seen_ids:
+                    item_errors['id'] = [f"Task {item['id']} appears more than once."]
+                seen_ids.add(item['id'])
+            errors.append(item_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        user = self.context["user"]
+        tasks = []
+        for item in validated_data:
+            item = dict(item)
+            status = item.pop("status", None)
+            task = Task(**self.relation_ids(item), created_by_id=user.id)
+            if status and not (user.is_user and status != "In Progress"):
+                task.status = status
+            tasks.append(task)
+
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create(tasks, batch_size=1000)
+            apply_task_changes((None, counted_state(task)) for task in tasks)
+            project_responses.invalidate({task.project_id for task in tasks})
+            task_events.publish_on_commit(task_event('created', task) for task in tasks)
+        return tasks
+
+    def update(self, instance, validated_data):
+        """
+        ``instance`` maps task ids to the Task rows being updated
+        """
+        updated_at = now()
+        fields = {'updated_at'}
+        changes = []
+        reassigned = []
+        events = []
+        tasks = []
+        for item in validated_data:
+            item = dict(item)
+            task = instance[item.pop('id')]
+            before = task._counted_state
+            for attr, value in self.relation_ids(item).items():
+                setattr(task, attr, value)
+                fields.add(attr)
+            task.updated_at = updated_at
+            changes.append((before, counted_state(task)))
+            previous, current = task._loaded_state, tracked_state(task)
+            moved = moved_from(previous, current)
+            if 'assigned_to_id' in moved:
+                reassigned.append((task.pk, task.project_id, moved['assigned_to_id']))
+            events.append(task_event(change_kind(previous.get('status'), current.get('status')), task, moved))
+            task._loaded_state = {**previous, **current}
+            tasks.append(task)
+
+        with transaction.atomic():
+            Task.objects.bulk_update(tasks, fields=sorted(fields), batch_size=1000)
+            apply_task_changes(changes)
+            record_tombstones(reassigned)
+            task_events.publish_on_commit(events)
+            project_responses.invalidate({
+                state[0] for change in changes for state in change if state is not None
+            })
+        return tasks
+
+    @staticmethod
+    def relation_ids(item):
+        for field in ('project', 'assigned_to'):
+            if field in item:
+                item[f'{field}_id'] = item.pop(field)
+        return item
+
+
+class BulkTaskSerializer(TaskSerializer):
+    """
+    One task of a bulk create. Relations arrive as plain ids and are checked
+    for the whole batch at once by BulkTaskListSerializer.
+    """
+    project = serializers.IntegerField()
+    assigned_to = serializers.IntegerField(required=False, allow_null=True)
+
+    class Meta(TaskSerializer.Meta):
+        list_serializer_class = BulkTaskListSerializer
+
+    def validate_project(self, value):
+        return value
+
+
+class BulkTaskUpdateSerializer(BulkTaskSerializer):
+    """
+    One task of a bulk partial update, identified by ``id``
+    """
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            raise serializers.ValidationError({"id": "This field is required."})
+        if self.context["user"].is_user and attrs.get("status") != "In Progress":
+            raise serializers.ValidationError({
+                "status": "As a regular user, you can only update tasks to 'In Progress'."
+            })
+        return attrs
+
+
+class ArchivedTaskSerializer(serializers.ModelSerializer):
+    """
+    An archived task in the shape of TaskSerializer, with plain ids for
+    the creator and relations
+    """
+    title = serializers.CharField(read_only=True)
+    description = serializers.CharField(read_only=True)
+    priority = serializers.CharField(read_only=True)
+    status = serializers.CharField(read_only=True)
+    project = serializers.IntegerField(source='project_id', read_only=True)
+    assigned_to = serializers.IntegerField(source='assigned_to_id', read_only=True)
+    created_by = serializers.IntegerField(source='created_by_id', read_only=True)
+
+    class Meta:
+        model = ArchivedTask
+        fields = [
+            "id",
+            "title",
+            "description",
+            "due_date",
+            "priority",
+            "status",
+            "project",
+            "assigned_to",
+            "created_at",
+            "updated_at",
+            "created_by",
+            "archived_at",
+        ]
+        read_only_fields = fields
+
+
+class TaskIdsSerializer(serializers.Serializer):
+    """
+    The tasks of a bulk approve or revoke
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'TASK_BULK_MAX_SIZE', 5000),
+    )
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     tasks = TaskSerializer(many=True, read_only=True)
-    created_by = UserRegistrationSerializer(read_only=True)
+    created_by = CachedUserSerializer(read_only=True)
 
     class Meta:
         model = Project
+        list_serializer_class = CreatedByListSerializer
         fields = [
             "id",
             "name",
@@ -87,11 +324,13 @@ class ProjectSerializer(serializers.ModelSerializer):
 
         read_only_fields = [
             "id",
-            "created_by"
+            "created_by",
+            "total_tasks",
+            "completed_tasks"
         ]
 
     def create(self, validated_data):
-        project = Project(**validated_data, created_by=self.context["user"])
+        project = Project(**validated_data, created_by_id=self.context["user"].id)
         project.save()
         return project
 
@@ -101,9 +340,13 @@ class ProjectDetailSerializer(serializers.Serializer):
     name = serializers.CharField()
     description = serializers.CharField()
     created_at = serializers.DateTimeField()
-    created_by = UserRegistrationSerializer(read_only=True)
+    created_by = CachedUserSerializer(read_only=True)
     total_tasks = serializers.IntegerField()
     completed_tasks = serializers.IntegerField()
+    pending_tasks = serializers.IntegerField()
+    in_progress_tasks = serializers.IntegerField()
+    pending_approval_tasks = serializers.IntegerField()
+    overdue_tasks = serializers.IntegerField()
 
     class Meta:
         model = Project
@@ -114,5 +357,9 @@ class ProjectDetailSerializer(serializers.Serializer):
             "created_at",
             "created_by",
             "total_tasks",
-            "completed_tasks"
+            "completed_tasks",
+            "pending_tasks",
+            "in_progress_tasks",
+            "pending_approval_tasks",
+            "overdue_tasks"
         ]
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .counters import apply_deltas, state_deltas
+from .events import change_kind, moved_from, task_event, task_events
+from .models import Project, Task, counted_state, tracked_state
+from .response_cache import project_responses
+from .sync import record_tombstones
+
+
+@receiver(pre_save, sender=Task)
+def load_counted_state(sender, instance, **kwargs):
+    # Tasks built in memory or loaded with deferred fields
+    if instance._state.adding or getattr(instance, '_counted_state', None) is not None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).only('project_id', 'status', 'due_date').first()
+    instance._counted_state = counted_state(previous) if previous else None
+
+
+@receiver(post_save, sender=Task)
+def update_project_counters(sender, instance, created, **kwargs):
+    before = None if created else getattr(instance, '_counted_state', None)
+    after = counted_state(instance)
+    if after is None:
+        instance.refresh_from_db(fields=['project', 'status', 'due_date'])
+        after = counted_state(instance)
+    apply_deltas(state_deltas(before, after))
+    project_responses.invalidate({before and before[0], after[0]})
+    instance._counted_state = after
+
+
+@receiver(post_delete, sender=Task)
+def release_project_counters(sender, instance, origin=None, **kwargs):
+    # The project itself is going away, its counters with it
+    if isinstance(origin, Project) or getattr(origin, 'model', None) is Project:
+        return
+    apply_deltas(state_deltas(getattr(instance, '_counted_state', None) or counted_state(instance), None))
+    project_responses.invalidate({instance.project_id})
+
+
+@receiver(post_save, sender=Task)
+def record_task_change(sender, instance, created, **kwargs):
+    previous = {} if created else getattr(instance, '_loaded_state', None) or {}
+    current = tracked_state(instance)
+    moved = moved_from(previous, current)
+    if 'assigned_to_id' in moved:
+        record_tombstones([(instance.pk, instance.project_id, moved['assigned_to_id'])])
+    kind = 'created' if created else change_kind(previous.get('status'), current.get('status'))
+    task_events.publish_on_commit([task_event(kind, instance, moved)])
+    instance._loaded_state = {**previous, **current}
+
+
+@receiver(post_delete, sender=Task)
+def record_deletion(sender, instance, **kwargs):
+    record_tombstones([(instance.pk, instance.project_id, instance.assigned_to_id)])
+    task_events.publish_on_commit([task_event('deleted', instance)])
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_responses(sender, instance, **kwargs):
+    project_responses.invalidate({instance.pk})
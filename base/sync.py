@@ -0,0 +1,114 @@
+import base64
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import TaskTombstone
+from .pagination import KeysetPagination
+
+SYNC_ORDERING = ('updated_at', 'id')
+
+
+class WatermarkExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Watermark is older than the deletion history, resync from scratch.'
+    default_code = 'watermark_expired'
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'TASK_TOMBSTONE_DAYS', 30))
+
+
+def encode_watermark(position, tombstone_id):
+    """
+    Opaque token for the last (updated_at, id) and tombstone id a client
+    has seen, stamped with its issue time
+    """
+    if position is not None:
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+    payload = json.dumps({'p': position, 't': tombstone_id, 's': int(time.time())}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_watermark(token, tasks):
+    """
+    (position, tombstone_id) of a token from encode_watermark, the position
+    converted to the SYNC_ORDERING values of ``tasks``, or (None, None) when
+    ``token`` is empty, i.e. a first sync
+    """
+    if not token:
+        return None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        position, tombstone_id, issued_at = payload['p'], payload['t'], payload['s']
+        if not is_integer(issued_at) or not (tombstone_id is None or is_integer(tombstone_id)):
+            raise ValueError('Invalid watermark')
+        if position is not None:
+            position = KeysetPagination.parse_position(tasks, SYNC_ORDERING, position)
+    except (TypeError, ValueError, KeyError):
+        raise ValidationError({'since': 'Invalid watermark'})
+    if issued_at < time.time() - tombstone_retention().total_seconds():
+        raise WatermarkExpired()
+    return position, tombstone_id
+
+
+def task_changes(tasks, tombstones, since, limit):
+    """
+    Tasks of ``tasks`` changed after the ``since`` watermark and the ids of
+    the ones that left it, at most ``limit`` of each. Returns
+    (changed, deleted_ids, watermark, has_more).
+    """
+    position, tombstone_id = decode_watermark(since, tasks)
+
+    changed = tasks.order_by(*SYNC_ORDERING)
+    if position is not None:
+        changed = changed.filter(KeysetPagination.seek(SYNC_ORDERING, position))
+    changed = list(changed[:limit + 1])
+
+    if tombstone_id is None:
+        # A first sync starts from the current state, no deletions to replay
+        tombstone_id = TaskTombstone.objects.aggregate(last=Max('id'))['last'] or 0
+        removed = []
+    else:
+        # A task can come back into view after its tombstone was written
+        removed = list(
+            tombstones.filter(id__gt=tombstone_id)
+            .exclude(task_id__in=tasks.order_by().values('id'))
+            .order_by('id')
+            .values_list('id', 'task_id')[:limit + 1]
+        )
+
+    has_more = len(changed) > limit or len(removed) > limit
+    changed, removed = changed[:limit], removed[:limit]
+    if changed:
+        position = [changed[-1].updated_at, changed[-1].id]
+    if removed:
+        tombstone_id = removed[-1][0]
+
+    deleted_ids = list(dict.fromkeys(task_id for _, task_id in removed))
+    return changed, deleted_ids, encode_watermark(position, tombstone_id), has_more
+
+
+def record_tombstones(entries):
+    """
+    Write a tombstone for each (task_id, project_id, assigned_to_id)
+    """
+    TaskTombstone.objects.bulk_create([
+        TaskTombstone(task_id=task_id, project_id=project_id, assigned_to_id=assigned_to_id)
+        for task_id, project_id, assigned_to_id in entries
+    ])
+
+
+def prune_tombstones():
+    deleted, _ = TaskTombstone.objects.filter(created_at__lt=now() - tombstone_retention()).delete()
+    return deleted
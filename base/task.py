@@ -3,9 +3,10 @@ from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
 from celery import shared_task
-from django.core.cache import cache
-from .models import Task
+from django.conf import settings
+from .approvals import approval_commits, commit_approvals
 from .management.commands.task_deletion import Command
+from .management.commands.recount_project_tasks import Command as RecountCommand
 
 def schedule_periodic_task():
     # Create an interval schedule (weekly)
@@ -21,6 +22,30 @@ def schedule_periodic_task():
         task='base.task.delete_old_completed_tasks',  # Full path to the task
     )
 
+    # Overdue counters drift as due dates pass without any write, so the
+    # project counters are recounted every hour
+    hourly, created = IntervalSchedule.objects.get_or_create(
+        every=1,
+        period=IntervalSchedule.HOURS,
+    )
+    PeriodicTask.objects.get_or_create(
+        interval=hourly,
+        name='recount_project_counters',
+        task='base.task.recount_project_counters',
+    )
+
+    # Approvals are committed in batches by one job instead of a delayed
+    # message per approval, see base.approvals
+    frequent, created = IntervalSchedule.objects.get_or_create(
+        every=getattr(settings, 'APPROVAL_COMMIT_INTERVAL', 10),
+        period=IntervalSchedule.SECONDS,
+    )
+    PeriodicTask.objects.get_or_create(
+        interval=frequent,
+        name='commit_due_approvals',
+        task='base.task.commit_due_approvals',
+    )
+
 
 
 
@@ -29,34 +54,30 @@ def delete_old_completed_tasks():
     # This will call the management command as a Celery task
     command = Command()
     command.handle()
-# tasks.py
 
 
+@shared_task
+def recount_project_counters():
+    command = RecountCommand()
+    command.handle()
+
+
+@shared_task
+def commit_due_approvals():
+    approved, discarded, skipped = approval_commits.drain()
+    return f"{approved} approvals committed, {discarded} discarded, {skipped} skipped."
+
 
 @shared_task
 def save_task_to_db(task_id):
-    # Retrieve the task from Redis
-    task_data = cache.get(f'task:{task_id}')
-    if not task_data:
+    # Single approval commit from before base.approvals, kept for the delayed
+    # messages still queued when it was deployed. Same outcome as a batch of one.
+    approved, discarded, skipped = commit_approvals([task_id])
+    if skipped:
         return f"Task {task_id} not found or approval revoked."
-
-    # Get the actual task object from the database
-    try:
-        task = Task.objects.get(id=task_id)
-    except Task.DoesNotExist:
-        return f"Task {task_id} not found in the database."
-
-    # Ensure the task is still approved
-    if task.status == 'Pending Approval':
-        task.status = 'Approved'
-        task.save()
-        # Remove the task from Redis after saving
-        cache.delete(f'task:{task_id}')
+    if approved:
         return f"Task {task_id} approved and saved to the database."
-    else:
-        task.delete()  # Optionally delete the task if status is not pending
-        cache.delete(f'task:{task_id}')
-        return f"Task {task_id} was not approved and has been discarded."
+    return f"Task {task_id} is no longer approved, its approval has been discarded."
 
 
 
@@ -0,0 +1,188 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.test import override_settings
+
+from .approvals import approval_commits
+from .events import task_events
+
+
+class MemoryPipeline:
+    """
+    Commands queued on a MemoryRedis until execute()
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        return lambda *args, **kwargs: self.commands.append((command, args, kwargs))
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+def in_score_range(score, minimum, maximum):
+    # Redis score bounds, '(' makes one exclusive
+    minimum, maximum = str(minimum), str(maximum)
+    above = score > float(minimum[1:]) if minimum.startswith('(') else score >= float(minimum)
+    below = score < float(maximum[1:]) if maximum.startswith('(') else score <= float(maximum)
+    return above and below
+
+
+class MemoryRedis:
+    """
+    In-process stand-in for the redis.Redis commands of the approval commit
+    queue and the task event bus, for benchmarks and tests without a Redis
+    server. Keys never expire and published messages pile up in ``messages``.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_sets = defaultdict(dict)
+        self.messages = []
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+    def incrby(self, key, amount=1):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def delete(self, *keys):
+        return sum(
+            self.values.pop(key, None) is not None or self.sorted_sets.pop(key, None) is not None for key in keys
+        )
+
+    def expire(self, key, seconds):
+        return key in self.values or key in self.sorted_sets
+
+    def publish(self, channel, message):
+        self.messages.append((channel, message))
+        return 0
+
+    def zadd(self, key, mapping):
+        members = self.sorted_sets[key]
+        added = sum(member not in members for member in mapping)
+        members.update(mapping)
+        return added
+
+    def zrem(self, key, *members):
+        return sum(self.sorted_sets[key].pop(member, None) is not None for member in members)
+
+    def zrangebyscore(self, key, minimum, maximum, start=None, num=None, withscores=False):
+        members = self.sorted_sets[key]
+        found = sorted(
+            (member for member, score in members.items() if in_score_range(score, minimum, maximum)),
+            key=members.get,
+        )
+        found = found if start is None else found[start:start + num]
+        return [(member, members[member]) for member in found] if withscores else found
+
+    def zremrangebyrank(self, key, start, end):
+        members = self.sorted_sets[key]
+        ranked = sorted(members, key=members.get)
+        end = len(ranked) + end if end < 0 else end
+        for member in ranked[start:end + 1]:
+            del members[member]
+        return max(0, end + 1 - start)
+
+    def register_script(self, script):
+        # base.approvals.CLAIM_SCRIPT, the only script the app registers
+        def claim(keys, args):
+            queued, processing = keys
+            limit = int(args[1])
+            task_ids = self.zrangebyscore(processing, '-inf', args[0], 0, limit)
+            due = self.zrangebyscore(queued, '-inf', args[0], 0, limit - len(task_ids))
+            self.zrem(queued, *due)
+            task_ids += due
+            self.zadd(processing, dict.fromkeys(task_ids, args[2]))
+            return task_ids
+
+        return claim
+
+
+class MemoryPubSub:
+    """
+    redis.asyncio pub/sub over the messages of a MemoryRedis. get_message()
+    returns at once, None when nothing new was published.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.channels = set()
+        self.position = len(client.messages)
+
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+        self.position = len(self.client.messages)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        while self.position < len(self.client.messages):
+            channel, message = self.client.messages[self.position]
+            self.position += 1
+            if channel in self.channels:
+                return {'type': 'message', 'channel': channel, 'data': message}
+        return None
+
+    async def aclose(self):
+        pass
+
+
+class AsyncMemoryRedis:
+    """
+    The redis.asyncio commands of TaskEventBus.subscribe on a MemoryRedis
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def pubsub(self):
+        return MemoryPubSub(self.client)
+
+    async def zrangebyscore(self, key, minimum, maximum, withscores=False):
+        return self.client.zrangebyscore(key, minimum, maximum, withscores=withscores)
+
+    async def aclose(self):
+        pass
+
+
+@contextmanager
+def redis_stand_in(url=None):
+    """
+    Point the Django cache, the approval commit queue and the task event
+    bus at the scratch Redis at ``url``, or at in-process stand-ins (the
+    local memory cache and a MemoryRedis) without one
+    """
+    buses = (approval_commits, task_events)
+    saved = [(bus, bus.url, bus._client) for bus in buses]
+    saved_async_client = task_events.__dict__.pop('async_client', None)
+    if url:
+        caches = {'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': url,
+            'KEY_PREFIX': 'benchmark',
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }}
+        for bus in buses:
+            bus.url, bus._client = url, None
+    else:
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        client = MemoryRedis()
+        for bus in buses:
+            bus._client = client
+        task_events.async_client = lambda: AsyncMemoryRedis(client)
+    approval_commits._claim = None
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        for bus, bus_url, bus_client in saved:
+            bus.url, bus._client = bus_url, bus_client
+        task_events.__dict__.pop('async_client', None)
+        if saved_async_client is not None:
+            task_events.async_client = saved_async_client
+        approval_commits._claim = None
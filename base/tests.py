@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import time
+from datetime import timedelta
+from unittest import addModuleCleanup, mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from account.auth import get_tokens_for_user
+from account.models import EmailCode, UserProfile
+from account.profiler import endpoint_stats
+from account.user_cache import user_cache
+from .approvals import approval_cache_key, approval_commits, change_status, commit_approvals
+from .benchmark import LoadBenchmark, compare
+from .cleanup import delete_tasks
+from .events import task_event, task_events
+from .counters import recount_projects
+from .models import ArchivedTask, Project, Task, TaskTombstone
+from .pagination import KeysetPagination
+from .rows import ORJSONRenderer
+from .search import search_tasks
+from .seeding import SEED_PASSWORD, Seeder
+from .sync import SYNC_ORDERING
+from .task import save_task_to_db
+from .testing import redis_stand_in
+from .views import (
+    ArchivedTaskListView,
+    PendingTasksView,
+    ProjectDetailView,
+    ProjectListCreateAPIView,
+    TaskListCreateAPIView,
+)
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+# Redis on a port nothing listens on
+UNREACHABLE_CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:9/0',
+        'OPTIONS': {'SOCKET_CONNECT_TIMEOUT': 0.1, 'SOCKET_TIMEOUT': 0.1},
+    }
+}
+
+
+def setUpModule():
+    # Task events and approval commits go to the in-process Redis stand-in
+    stand_in = redis_stand_in()
+    stand_in.__enter__()
+    addModuleCleanup(stand_in.__exit__, None, None, None)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """
+    Every hot queryset must be answered through an index, never a full scan
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.user = UserProfile.objects.create_user(
+            username='user', email='user@example.com', password='pw', role='User', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.manager)
+        Task.objects.create(
+            title='Task', description='', due_date=timezone.now() + timedelta(days=1),
+            project=cls.project, created_by=cls.manager, assigned_to=cls.user,
+        )
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make sequential scans look cheap, only allow
+            # them when no index can serve the query at all
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'No query plan check for {connection.vendor}')
+
+    def view_queryset(self, view_class, user, query=None, **kwargs):
+        request = Request(APIRequestFactory().get('/', query or {}))
+        request.user = user
+        view = view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        if kwargs:
+            return queryset.filter(pk=kwargs['pk'])
+        paginator = view.pagination_class()
+        return queryset.order_by(*paginator.get_ordering(queryset))[:paginator.page_size + 1]
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            if connection.vendor == 'sqlite':
+                # Full-text matches scan the FTS index, which is a virtual table
+                self.assertFalse(
+                    ' SCAN ' in f' {line} ' and 'USING' not in line and 'VIRTUAL TABLE INDEX' not in line,
+                    f'Full table scan:\n{plan}'
+                )
+            else:
+                self.assertNotIn('Seq Scan', line, f'Full table scan:\n{plan}')
+
+    def test_task_list_for_users(self):
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.user))
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.user, {'status': 'Pending'}))
+
+    def test_task_list_for_managers(self):
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.manager))
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.manager, {'status': 'Completed'}))
+
+    def test_pending_tasks(self):
+        self.assertIndexed(self.view_queryset(PendingTasksView, self.manager))
+
+    def test_task_search(self):
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.manager, {'q': 'task'}))
+        self.assertIndexed(self.view_queryset(TaskListCreateAPIView, self.user, {'q': 'task', 'status': 'Pending'}))
+
+    def test_project_list(self):
+        self.assertIndexed(self.view_queryset(ProjectListCreateAPIView, self.manager))
+
+    def test_project_detail_counts(self):
+        self.assertIndexed(self.view_queryset(ProjectDetailView, self.manager, pk=self.project.pk))
+
+    def test_task_changes_for_users(self):
+        position = [timezone.now().isoformat(), 0]
+        tasks = Task.objects.filter(assigned_to_id=self.user.id)
+        self.assertIndexed(tasks.filter(KeysetPagination.seek(SYNC_ORDERING, position)).order_by(*SYNC_ORDERING)[:101])
+        tombstones = TaskTombstone.objects.filter(assigned_to_id=self.user.id, id__gt=0)
+        self.assertIndexed(tombstones.order_by('id')[:101])
+
+    def test_archived_tasks(self):
+        self.assertIndexed(self.view_queryset(ArchivedTaskListView, self.manager, {'project_id': self.project.pk}))
+
+    def test_completed_task_cleanup(self):
+        tasks = Task.objects.filter(status='Completed', updated_at__lt=timezone.now())
+        self.assertIndexed(tasks)
+        # One batch of the task_deletion command
+        self.assertIndexed(tasks.filter(pk__gt=0).order_by('pk')[:1000])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryCountTests(TestCase):
+    """
+    Serializing a page must not cost queries per project, task or creator
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        creators = [cls.admin, cls.manager]
+        for project_index in range(3):
+            project = Project.objects.create(
+                name=f'Project {project_index}', description='', created_by=creators[project_index % 2]
+            )
+            for task_index in range(4):
+                Task.objects.create(
+                    title=f'Task {task_index}', description='', due_date=timezone.now() + timedelta(days=1),
+                    status='Pending Approval' if task_index % 2 else 'Completed',
+                    project=project, created_by=creators[task_index % 2], assigned_to=cls.manager,
+                )
+        cls.project = project
+        cls.task = Task.objects.filter(project=project).first()
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def assertQueries(self, user, url, count):
+        client = self.client_for(user)
+        with self.assertNumQueries(count):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_project_list(self):
+        # Projects with counts and creators, then their tasks with creators
+        self.assertQueries(self.admin, '/base/projects/', 2)
+
+    def test_project_retrieve(self):
+        self.assertQueries(self.admin, f'/base/projects/{self.project.pk}/', 2)
+
+    def test_project_details(self):
+        self.assertQueries(self.manager, f'/base/project_details/{self.project.pk}/', 1)
+
+    def test_task_list(self):
+        self.assertQueries(self.manager, '/base/tasks/', 1)
+
+    def test_task_retrieve(self):
+        self.assertQueries(self.manager, f'/base/tasks/{self.task.pk}/', 1)
+
+    def test_pending_tasks(self):
+        self.assertQueries(self.manager, '/base/tasks/pending/', 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProjectResponseCacheTests(TestCase):
+    """
+    Project payloads are served from the cache until the project or one of
+    its tasks changes
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+        cls.task = Task.objects.create(
+            title='Task', description='', due_date=timezone.now() + timedelta(days=1),
+            project=cls.project, created_by=cls.admin, assigned_to=cls.admin,
+        )
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}")
+
+    def assertCached(self, url):
+        miss = self.client.get(url)
+        with self.assertNumQueries(0):
+            hit = self.client.get(url)
+        self.assertEqual((miss['X-Cache'], hit['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(miss.json(), hit.json())
+        return hit
+
+    def test_hits_skip_the_database(self):
+        for url in (f'/base/projects/{self.project.pk}/', f'/base/project_details/{self.project.pk}/'):
+            response = self.assertCached(url)
+            with self.assertNumQueries(0):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(not_modified.status_code, 304)
+
+    def test_task_writes_invalidate(self):
+        url = f'/base/project_details/{self.project.pk}/'
+        self.assertCached(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = 'Completed'
+            self.task.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['completed_tasks'], 1)
+
+    def test_project_writes_invalidate(self):
+        url = f'/base/projects/{self.project.pk}/'
+        self.assertCached(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'name': 'Renamed'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'Renamed')
+
+    @override_settings(CACHES=UNREACHABLE_CACHES)
+    def test_unreachable_cache_is_skipped(self):
+        url = f'/base/project_details/{self.project.pk}/'
+        with self.assertLogs(level='WARNING') as logs, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(url)
+            self.assertEqual((response.status_code, response['X-Cache']), (200, 'MISS'))
+            response = self.client.post('/base/tasks/', {
+                'title': 'Task', 'description': 'New', 'due_date': (timezone.now() + timedelta(days=1)).isoformat(),
+                'status': 'Pending', 'project': self.project.pk, 'assigned_to': self.admin.pk,
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+            Project.objects.create(name='Other', description='', created_by=self.admin)
+        self.assertTrue(any('Could not invalidate' in line for line in logs.output))
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self.client.get(url).json()['total_tasks'], 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskChangesTests(TestCase):
+    """
+    /base/tasks/changes/ replays creations, updates and deletions after a
+    watermark exactly once
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.manager)
+        cls.tasks = [
+            Task.objects.create(
+                title=f'Task {index}', description='', due_date=timezone.now() + timedelta(days=1),
+                project=cls.project, created_by=cls.manager, assigned_to=cls.manager,
+            )
+            for index in range(5)
+        ]
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/base/tasks/changes/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_full_sync_in_pages(self):
+        first = self.changes(page_size=3)
+        self.assertTrue(first['has_more'])
+        second = self.changes(first['watermark'], page_size=3)
+        self.assertFalse(second['has_more'])
+        synced = [task['id'] for task in first['tasks'] + second['tasks']]
+        self.assertEqual(sorted(synced), sorted(task.id for task in self.tasks))
+        self.assertEqual(self.changes(second['watermark'])['tasks'], [])
+
+    def test_updates_and_deletions(self):
+        watermark = self.changes()['watermark']
+        updated, deleted = self.tasks[0], self.tasks[1]
+        updated.title = 'Renamed'
+        updated.save()
+        deleted_id = deleted.id
+        deleted.delete()
+
+        changes = self.changes(watermark)
+        self.assertEqual([task['id'] for task in changes['tasks']], [updated.id])
+        self.assertEqual(changes['deleted'], [deleted_id])
+        self.assertEqual(self.changes(changes['watermark'])['deleted'], [])
+
+    def test_invalid_watermark(self):
+        response = self.client.get('/base/tasks/changes/', {'since': 'not-a-watermark'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_tampered_watermarks(self):
+        now, issued_at = timezone.now().isoformat(), int(time.time())
+        for payload in (
+            {'p': None, 't': 0, 's': 'x'},
+            {'p': None, 't': 0, 's': None},
+            {'p': None, 't': 'x', 's': issued_at},
+            {'p': None, 't': [1], 's': issued_at},
+            {'p': ['abc', 1], 't': 0, 's': issued_at},
+            {'p': [now, 'x'], 't': 0, 's': issued_at},
+            {'p': [None, 1], 't': 0, 's': issued_at},
+            {'p': [now], 't': 0, 's': issued_at},
+        ):
+            with self.subTest(payload=payload):
+                since = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+                response = self.client.get('/base/tasks/changes/', {'since': since})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'since': 'Invalid watermark'})
+
+        expired = base64.urlsafe_b64encode(json.dumps({'p': None, 't': 0, 's': 0}).encode()).decode()
+        self.assertEqual(self.client.get('/base/tasks/changes/', {'since': expired}).status_code, 410)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskEventTests(TestCase):
+    """
+    /base/tasks/events/ streams the events of the followed channels and
+    resumes after Last-Event-ID
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.manager)
+        cls.other_project = Project.objects.create(name='Other', description='', created_by=cls.manager)
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.authorization = f"Bearer {get_tokens_for_user(self.manager)['access']}"
+
+    def publish(self, title, project):
+        task = Task(
+            id=len(task_events.client.messages) + 1, title=title, status='Pending', project=project,
+            due_date=timezone.now(), updated_at=timezone.now(),
+        )
+        task_events.publish([task_event('updated', task)])
+
+    def test_needs_asgi(self):
+        response = self.client.get('/base/tasks/events/', HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(response.status_code, 501)
+
+    def test_writes_publish_events(self):
+        messages = len(task_events.client.messages)
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(
+                title='Task', description='', due_date=timezone.now() + timedelta(days=1),
+                project=self.project, created_by=self.manager, assigned_to=self.manager,
+            )
+        channels = {channel for channel, _ in task_events.client.messages[messages:]}
+        self.assertEqual(channels, {
+            'task_events:all', f'task_events:project:{self.project.pk}', f'task_events:user:{self.manager.pk}',
+        })
+
+    async def test_stream_and_resume(self):
+        self.publish('Missed', self.project)
+        last_event_id = task_events.client.values['task_events:last_id']
+        self.publish('Resumed', self.project)
+        self.publish('Other project', self.other_project)
+
+        response = await AsyncClient().get(
+            '/base/tasks/events/', {'project': self.project.pk},
+            headers={'Authorization': self.authorization, 'Last-Event-ID': str(last_event_id)},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+
+        resumed = (await anext(chunks)).decode()
+        self.assertTrue(resumed.startswith(f'id: {last_event_id + 1}\nevent: updated\n'))
+        self.assertEqual(json.loads(resumed.split('data: ')[1])['task']['title'], 'Resumed')
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+
+        self.publish('Live', self.project)
+        live = (await anext(chunks)).decode()
+        self.assertEqual(json.loads(live.split('data: ')[1])['task']['title'], 'Live')
+        await chunks.aclose()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ExportTests(TestCase):
+    """
+    Exports stream every filtered row from one query
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project, "quoted"', description='', created_by=cls.manager)
+        for index in range(6):
+            Task.objects.create(
+                title=f'Task {index}', description='', due_date=timezone.now() + timedelta(days=1),
+                status='Completed' if index % 2 else 'Pending',
+                project=cls.project, created_by=cls.manager, assigned_to=cls.manager,
+            )
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            return response, b''.join(response.streaming_content).decode()
+
+    def test_tasks_ndjson(self):
+        response, content = self.export('/base/tasks/export/?status=Completed')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['status'] for row in rows], ['Completed'] * 3)
+        self.assertEqual(rows[0]['project'], self.project.pk)
+
+    def test_projects_csv(self):
+        response, content = self.export('/base/projects/export/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        header, row = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(header[:2], ['id', 'name'])
+        self.assertEqual(row[1], self.project.name)
+        self.assertEqual(row[header.index('total_tasks')], '6')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TaskSearchTests(TestCase):
+    """
+    ?q= finds tasks by title, description, assignee and project, best
+    matches first, and follows edits made after the task was indexed
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.project = Project.objects.create(name='Apollo', description='', created_by=cls.manager)
+        # Counters are applied on commit, run the callbacks so the delete below can release them
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.login_bug = cls.create_task('Login fails', 'Users see an error page')
+            cls.docs = cls.create_task('Write documentation', 'Describe the login flow')
+            cls.other = cls.create_task('Plan release', 'Nothing to see here')
+
+    @classmethod
+    def create_task(cls, title, description):
+        return Task.objects.create(
+            title=title, description=description, due_date=timezone.now() + timedelta(days=1),
+            project=cls.project, created_by=cls.manager, assigned_to=cls.manager,
+        )
+
+    client_class = APIClient
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+
+    def search(self, text):
+        response = self.client.get('/base/tasks/', {'q': text})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [task['id'] for task in response.json()['results']]
+
+    def test_ranked_by_relevance(self):
+        # A title match outranks a description match
+        self.assertEqual(self.search('login'), [self.login_bug.id, self.docs.id])
+
+    def test_prefix_and_related_names(self):
+        self.assertEqual(self.search('documen'), [self.docs.id])
+        self.assertEqual(len(self.search('apollo manager')), 3)
+        self.assertEqual(self.search('"; DROP TABLE'), [])
+
+    def test_index_follows_edits(self):
+        self.other.title = 'Launch rocket'
+        self.other.save()
+        self.project.refresh_from_db()
+        self.project.name = 'Artemis'
+        self.project.save()
+        self.assertEqual(self.search('rocket'), [self.other.id])
+        self.assertEqual(len(self.search('artemis')), 3)
+        self.assertEqual(self.search('apollo'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.docs.delete()
+        self.assertEqual(self.search('login'), [self.login_bug.id])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FastListTests(TestCase):
+    """
+    The values()/orjson list path (base.rows) must render exactly the bytes
+    the serializers and JSONRenderer do
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        due_date = timezone.now().replace(microsecond=123456) + timedelta(days=1)
+        for project_index, name in enumerate(['Plain', 'Ünïcode \u2028 "quoted"\n', 'Empty']):
+            project = Project.objects.create(name=name, description='\t<b>&</b>', created_by=cls.admin)
+            if name == 'Empty':
+                continue
+            for task_index in range(5):
+                Task.objects.create(
+                    title=f'Task {task_index} \u2029 ✓', description='line\nbreak \x01',
+                    due_date=due_date + timedelta(hours=task_index),
+                    status='Pending Approval' if task_index % 2 else 'Pending',
+                    project=project, created_by=[cls.admin, cls.manager][task_index % 2],
+                    assigned_to=cls.manager if task_index % 3 else None,
+                )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}")
+
+    def assertSameBytes(self, url):
+        with self.settings(FAST_LIST_RESPONSES=False):
+            expected = self.client.get(url, HTTP_ACCEPT='application/json')
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(expected.status_code, 200, expected.content)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_task_lists(self):
+        response = self.assertSameBytes('/base/tasks/?page_size=3')
+        self.assertSameBytes(response.json()['next'])
+        self.assertSameBytes('/base/tasks/?status=Pending')
+        self.assertSameBytes('/base/tasks/?q=task')
+
+    def test_pending_tasks(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        self.assertSameBytes('/base/tasks/pending/')
+
+    def test_project_list(self):
+        response = self.assertSameBytes('/base/projects/?page_size=2')
+        self.assertSameBytes(response.json()['next'])
+
+    def test_renderer(self):
+        data = {'text': 'é \u2028 \u2029 \x00 "', 'when': timezone.now(), 'none': None, 1: [True, 2]}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+def cursor(position, reverse=False):
+    return base64.urlsafe_b64encode(json.dumps({'p': position, 'r': int(reverse)}).encode()).decode()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    """
+    Cursors walk the ordering both ways and tampered ones are rejected
+    before they reach the database
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+        for index in range(7):
+            Task.objects.create(
+                title=f'Task {index}', description='', due_date=timezone.now() + timedelta(days=1),
+                status='Pending', project=project, created_by=cls.admin, assigned_to=cls.admin,
+            )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}")
+
+    def test_walks_forward_and_back(self):
+        expected = list(Task.objects.order_by('-updated_at', '-id').values_list('id', flat=True))
+        pages, url = [], '/base/tasks/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            pages.append([task['id'] for task in page['results']])
+            url = page['next']
+        self.assertEqual(pages, [expected[:3], expected[3:6], expected[6:]])
+
+        previous = self.client.get(page['previous']).json()
+        self.assertEqual([task['id'] for task in previous['results']], expected[3:6])
+
+    def test_tampered_cursors(self):
+        now = timezone.now().isoformat()
+        for position in (['abc', 1], [None, 1], [{'x': 1}, 1], [now, 'x'], [now, None], [now], now):
+            for url in ('/base/tasks/', '/base/archive/tasks/'):
+                with self.subTest(position=position, url=url):
+                    response = self.client.get(url, {'cursor': cursor(position), 'project_id': 1})
+                    self.assertEqual(response.status_code, 404)
+                    self.assertEqual(response.json()['detail'], 'Invalid cursor')
+        self.assertEqual(self.client.get('/base/tasks/', {'cursor': 'not base64'}).status_code, 404)
+
+    def test_search_rank_cursor(self):
+        response = self.client.get('/base/tasks/', {'q': 'task', 'page_size': 2})
+        self.assertEqual(self.client.get(response.json()['next']).status_code, 200)
+        response = self.client.get('/base/tasks/', {'q': 'task', 'cursor': cursor(['high', 1])})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalRequestTests(TestCase):
+    """
+    Validators answer 304 and 412 before the object or page is loaded
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+        cls.task = Task.objects.create(
+            title='Task', description='', due_date=timezone.now() + timedelta(days=1), status='Pending',
+            project=project, created_by=cls.admin, assigned_to=cls.manager,
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        self.url = f'/base/tasks/{self.task.pk}/'
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Task.objects.filter(pk=self.task.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_are_per_user(self):
+        admin = APIClient()
+        admin.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.admin)['access']}")
+        self.assertNotEqual(self.client.get('/base/tasks/')['ETag'], admin.get('/base/tasks/')['ETag'])
+
+    def test_if_match(self):
+        etag = self.client.get(self.url)['ETag']
+        data = {'title': 'Changed', 'status': 'In Progress'}
+
+        response = self.client.patch(self.url, data, format='json', HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Task')
+
+        response = self.client.patch(self.url, data, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # The update changed the task, the old validator no longer matches
+        response = self.client.patch(self.url, {'title': 'Again', 'status': 'Pending'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+
+    def test_list(self):
+        response = self.client.get('/base/tasks/')
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/base/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/base/tasks/?status=Pending', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Task.objects.filter(pk=self.task.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        response = self.client.get('/base/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # A task joining the page changes it
+        Task.objects.create(
+            title='Other', description='', due_date=timezone.now() + timedelta(days=1), status='Pending',
+            project=self.task.project, created_by=self.admin, assigned_to=self.manager,
+        )
+        self.assertEqual(self.client.get('/base/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(FAST_LIST_RESPONSES=False)
+    def test_list_validators_match_across_list_paths(self):
+        etag = self.client.get('/base/tasks/')['ETag']
+        with self.settings(FAST_LIST_RESPONSES=True):
+            self.assertEqual(self.client.get('/base/tasks/')['ETag'], etag)
+        self.assertEqual(self.client.get('/base/tasks/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AccessTests(TestCase):
+    """
+    Row-level access is decided by the query that loads the task
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+        cls.task = Task.objects.create(
+            title='Task', description='', due_date=timezone.now() + timedelta(days=1), status='Approved',
+            project=project, created_by=cls.admin, assigned_to=cls.admin,
+        )
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def test_detail_of_unassigned_task(self):
+        client = self.client_for(self.manager)
+        with self.assertNumQueries(1):
+            response = client.get(f'/base/tasks/{self.task.pk}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['detail'], "You don't have permission to access this task")
+        self.assertEqual(self.client_for(self.admin).get(f'/base/tasks/{self.task.pk}/').status_code, 200)
+
+    def test_roles_without_access_skip_the_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(list(Task.objects.for_user(self.admin, 'approve')), [])
+            self.assertEqual(list(Project.objects.for_user(self.manager, 'change')), [])
+
+    def test_only_managers_revoke(self):
+        response = self.client_for(self.admin).post(f'/base/revoke/{self.task.pk}/')
+        self.assertEqual(response.status_code, 403)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'Approved')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApprovalCommitTests(TestCase):
+    """
+    Batched approval commits keep the outcomes of save_task_to_db
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.manager)
+
+    def setUp(self):
+        cache.clear()
+        approval_commits.client.delete(approval_commits.key, approval_commits.processing_key)
+
+    def create_task(self, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Task.objects.create(
+                title='Task', description='', due_date=timezone.now() + timedelta(days=1), status=status,
+                project=self.project, created_by=self.manager, assigned_to=self.manager,
+            )
+
+    def test_commit_approvals(self):
+        pending = self.create_task('Pending Approval')
+        approved = self.create_task('Approved')
+        completed = self.create_task('Completed')
+        revoked = self.create_task('Pending Approval')
+        for task in (pending, approved, completed):
+            cache.set(approval_cache_key(task.pk), {'status': task.status})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = commit_approvals([pending.pk, approved.pk, completed.pk, revoked.pk, 0])
+
+        self.assertEqual(counts, (2, 1, 2))
+        statuses = dict(Task.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[task.pk] for task in (pending, approved, completed, revoked)],
+            ['Approved', 'Approved', 'Completed', 'Pending Approval'],
+        )
+        self.assertIsNone(cache.get(approval_cache_key(pending.pk)))
+        self.assertIsNone(cache.get(approval_cache_key(completed.pk)))
+        self.assertEqual(recount_projects(), [])
+
+    def test_approval_is_queued(self):
+        task = self.create_task('Pending Approval')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        with mock.patch.object(approval_commits, 'schedule') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/base/approve/{task.pk}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        schedule.assert_called_once_with([task.pk])
+
+    def test_cache_entry_outlives_the_commit(self):
+        task = self.create_task('Pending Approval')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        approved_at = time.time()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post(f'/base/approve/{task.pk}/').status_code, 200)
+
+        # Due after the delay, drained up to one interval later
+        with mock.patch('time.time', return_value=approved_at + approval_commits.delay + approval_commits.interval), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNotNone(cache.get(approval_cache_key(task.pk)))
+            counts = approval_commits.drain()
+        # Approved work is kept
+        self.assertEqual(counts, (1, 0, 0))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'Approved')
+        self.assertIsNone(cache.get(approval_cache_key(task.pk)))
+
+    def test_crashed_drain_is_retried(self):
+        task = self.create_task('Pending Approval')
+        cache.set(approval_cache_key(task.pk), {'status': task.status}, timeout=approval_commits.cache_timeout)
+        approval_commits.schedule([task.pk])
+        due = time.time() + approval_commits.delay
+
+        with mock.patch('time.time', return_value=due):
+            # The drain dies between claiming the batch and committing it
+            self.assertEqual(approval_commits.claim(10), [task.pk])
+            self.assertEqual(approval_commits.drain(), (0, 0, 0))
+        with mock.patch('time.time', return_value=due + approval_commits.claim_timeout), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(approval_commits.drain(), (1, 0, 0))
+            self.assertEqual(approval_commits.drain(), (0, 0, 0))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'Approved')
+
+    def test_failed_commit_is_retried(self):
+        task = self.create_task('Pending Approval')
+        cache.set(approval_cache_key(task.pk), {'status': task.status}, timeout=approval_commits.cache_timeout)
+        approval_commits.schedule([task.pk])
+        due = time.time() + approval_commits.delay
+
+        with mock.patch('time.time', return_value=due):
+            # The commit fails after the cache entries were read
+            with mock.patch('base.approvals.change_status', side_effect=DatabaseError('disk I/O error')), \
+                    self.assertRaises(DatabaseError):
+                approval_commits.drain()
+            self.assertIsNotNone(cache.get(approval_cache_key(task.pk)))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(approval_commits.drain(), (1, 0, 0))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'Approved')
+        self.assertIsNone(cache.get(approval_cache_key(task.pk)))
+
+    def test_revoke_cancels_the_commit(self):
+        task = self.create_task('Approved')
+        cache.set(approval_cache_key(task.pk), {'status': 'Pending Approval'})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        with mock.patch.object(approval_commits, 'cancel') as cancel, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/base/revoke/{task.pk}/')
+        self.assertEqual(response.status_code, 200, response.content)
+        cancel.assert_called_once_with([task.pk])
+        # A commit that was already claimed finds nothing left to do
+        self.assertEqual(save_task_to_db(task.pk), f'Task {task.pk} not found or approval revoked.')
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'Pending Approval')
+
+    def test_bulk_approve_and_revoke(self):
+        pending = [self.create_task('Pending Approval') for _ in range(3)]
+        done = self.create_task('Completed')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        ids = [task.pk for task in pending] + [done.pk, 0]
+
+        with mock.patch.object(approval_commits, 'schedule') as schedule, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/base/approve/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            [result['result'] for result in response.json()['results']],
+            ['approved'] * 3 + ['not_pending_approval', 'not_found'],
+        )
+        schedule.assert_called_once_with([task.pk for task in pending])
+        self.assertEqual(Task.objects.filter(status='Approved').count(), 3)
+        self.assertIsNotNone(cache.get(approval_cache_key(pending[0].pk)))
+
+        with mock.patch.object(approval_commits, 'cancel') as cancel, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/base/revoke/bulk/', {'ids': ids[:2] + [done.pk]}, format='json')
+        self.assertEqual(list(cancel.call_args.args[0]), ids[:2])
+        self.assertEqual(
+            [result['result'] for result in response.json()['results']],
+            ['revoked', 'revoked', 'not_approved'],
+        )
+        self.assertIsNone(cache.get(approval_cache_key(pending[0].pk)))
+        self.assertEqual(Task.objects.filter(status='Pending Approval').count(), 2)
+        self.assertEqual(recount_projects(), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TASK_BULK_MAX_SIZE=3)
+class TaskBulkTests(TestCase):
+    """
+    Bulk creates and updates validate per item and write the batch at once
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+
+    def item(self, **fields):
+        return {
+            'title': 'Task', 'description': 'Bulk', 'due_date': (timezone.now() + timedelta(days=1)).isoformat(),
+            'status': 'Pending', 'project': self.project.pk, 'assigned_to': self.manager.pk, **fields,
+        }
+
+    def test_size_limit(self):
+        response = self.client.post('/base/tasks/bulk/', [self.item()] * 4, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+    def test_errors_per_item(self):
+        response = self.client.post('/base/tasks/bulk/', [self.item(), self.item(title='')], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [{}, {'title': ['This field may not be blank.']}])
+
+        # Relations are checked for the whole batch once the fields are valid
+        response = self.client.post('/base/tasks/bulk/', [
+            self.item(project=0), self.item(), self.item(assigned_to=0),
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([list(errors) for errors in response.json()], [['project'], [], ['assigned_to']])
+        self.assertFalse(Task.objects.exists())
+
+    def test_create_and_update_counters(self):
+        response = self.client.post('/base/tasks/bulk/', [self.item()] * 3, format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [task['id'] for task in response.json()]
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.total_tasks, self.project.pending_tasks), (3, 3))
+
+        response = self.client.patch('/base/tasks/bulk/', [
+            {'id': ids[0], 'status': 'Completed'}, {'id': ids[1], 'status': 'In Progress'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        self.assertEqual(
+            (self.project.pending_tasks, self.project.in_progress_tasks, self.project.completed_tasks), (1, 1, 1)
+        )
+
+        response = self.client.patch('/base/tasks/bulk/', [{'id': ids[0]}, {'id': ids[0]}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()[1]), ['id'])
+
+    def test_updates_need_access_to_every_task(self):
+        own = Task.objects.create(
+            title='Own', description='', due_date=timezone.now() + timedelta(days=1), status='Pending',
+            project=self.project, created_by=self.admin, assigned_to=self.manager,
+        )
+        other = Task.objects.create(
+            title='Other', description='', due_date=timezone.now() + timedelta(days=1), status='Pending',
+            project=self.project, created_by=self.admin, assigned_to=self.admin,
+        )
+        response = self.client.patch('/base/tasks/bulk/', [
+            {'id': own.pk, 'title': 'Changed'}, {'id': other.pk, 'title': 'Changed'},
+        ], format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['ids'], [other.pk])
+        self.assertFalse(Task.objects.filter(title='Changed').exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProjectCounterTests(TestCase):
+    """
+    Project counters follow task writes and recount_project_tasks repairs drift
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+
+    def create_task(self, status='Pending', due_in=timedelta(hours=1)):
+        return Task.objects.create(
+            title='Task', description='', due_date=timezone.now() + due_in, status=status,
+            project=self.project, created_by=self.admin, assigned_to=self.admin,
+        )
+
+    def counters(self):
+        return Project.objects.values(
+            'total_tasks', 'pending_tasks', 'completed_tasks', 'pending_approval_tasks', 'overdue_tasks'
+        ).get(pk=self.project.pk)
+
+    def later(self):
+        # Every task created so far is past its due date
+        return mock.patch('base.models.now', return_value=timezone.now() + timedelta(days=1))
+
+    def test_writes_update_counters(self):
+        task = self.create_task()
+        self.create_task(due_in=-timedelta(hours=1))
+        task.status = 'Completed'
+        task.save()
+        self.assertEqual(self.counters(), {
+            'total_tasks': 2, 'pending_tasks': 1, 'completed_tasks': 1, 'pending_approval_tasks': 0, 'overdue_tasks': 1,
+        })
+        task.delete()
+        self.assertEqual(self.counters()['total_tasks'], 1)
+
+    def test_tasks_fallen_overdue_since_counted(self):
+        tasks = [self.create_task(), self.create_task(), self.create_task(status='Pending Approval')]
+        self.assertEqual(self.counters()['overdue_tasks'], 0)
+        with self.later():
+            completed = Task.objects.get(pk=tasks[0].pk)
+            completed.status = 'Completed'
+            completed.save()
+            Task.objects.get(pk=tasks[1].pk).delete()
+            change_status(list(Task.objects.filter(pk=tasks[2].pk)), 'Pending Approval', 'Approved')
+        self.assertEqual(self.counters(), {
+            'total_tasks': 2, 'pending_tasks': 0, 'completed_tasks': 1, 'pending_approval_tasks': 0, 'overdue_tasks': 0,
+        })
+
+        self.create_task()
+        with self.later():
+            delete_tasks(list(Task.objects.filter(status='Pending')))
+        self.assertEqual(self.counters()['overdue_tasks'], 0)
+
+    def test_recount(self):
+        self.create_task()
+        self.create_task(due_in=-timedelta(hours=1))
+        Project.objects.filter(pk=self.project.pk).update(total_tasks=5, overdue_tasks=0)
+
+        out = io.StringIO()
+        call_command('recount_project_tasks', '--dry-run', stdout=out)
+        self.assertIn('1 projects would be repaired', out.getvalue())
+        self.assertEqual(self.counters()['total_tasks'], 5)
+
+        call_command('recount_project_tasks', '--project', str(self.project.pk), stdout=io.StringIO())
+        self.assertEqual(self.counters(), {
+            'total_tasks': 2, 'pending_tasks': 2, 'completed_tasks': 0, 'pending_approval_tasks': 0, 'overdue_tasks': 1,
+        })
+        self.assertEqual(recount_projects(), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TASK_DELETION_SLEEP=0, TASK_DELETION_ARCHIVE=False)
+class TaskDeletionTests(TestCase):
+    """
+    task_deletion removes old completed tasks in batches, keeping counters
+    and tombstones right, and can stop early and resume
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        project = Project.objects.create(name='Project', description='', created_by=cls.manager)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for index in range(5):
+                Task.objects.create(
+                    title=f'Task {index}', description='', due_date=timezone.now() + timedelta(days=1),
+                    status='Completed' if index else 'Pending',
+                    project=project, created_by=cls.manager, assigned_to=cls.manager,
+                )
+        Task.objects.update(updated_at=timezone.now() - timedelta(days=30))
+
+    def run_command(self, **options):
+        output = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('task_deletion', stdout=output, **options)
+        return output.getvalue()
+
+    def test_dry_run(self):
+        self.assertIn('4 tasks would be deleted.', self.run_command(dry_run=True))
+        self.assertEqual(Task.objects.count(), 5)
+
+    def test_batches(self):
+        output = self.run_command(batch_size=3)
+        self.assertIn('4 tasks deleted successfully.', output)
+        self.assertEqual(list(Task.objects.values_list('status', flat=True)), ['Pending'])
+        self.assertEqual(TaskTombstone.objects.count(), 4)
+        self.assertEqual(recount_projects(), [])
+
+    def test_time_budget_and_resume(self):
+        output = self.run_command(batch_size=2, time_budget=0.000001)
+        last_id = int(output.split('--start-after ')[1].rstrip('.\n'))
+        self.assertEqual(Task.objects.count(), 3)
+
+        self.run_command(batch_size=2, time_budget=0, start_after=last_id)
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_archive(self):
+        self.assertIn('4 tasks archived successfully.', self.run_command(batch_size=3, archive=True))
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(TaskTombstone.objects.count(), 4)
+        self.assertEqual(recount_projects(), [])
+
+        project_id = ArchivedTask.objects.values_list('project_id', flat=True)[0]
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.manager)['access']}")
+        response = client.get('/base/archive/tasks/', {'project_id': project_id})
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual([task['title'] for task in results], ['Task 4', 'Task 3', 'Task 2', 'Task 1'])
+        self.assertEqual(results[0]['status'], 'Completed')
+
+        response = client.get('/base/archive/tasks/', {
+            'project_id': project_id, 'updated_at__gte': (timezone.now() - timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(client.get('/base/archive/tasks/').status_code, 400)
+
+    def test_archive_retention(self):
+        self.run_command(archive=True)
+        ArchivedTask.objects.filter(pk__in=ArchivedTask.objects.order_by('pk').values('pk')[:3]).update(
+            updated_at=timezone.now() - timedelta(days=400)
+        )
+        self.assertIn('3 archived tasks pruned.', self.run_command(archive=True))
+        self.assertEqual(ArchivedTask.objects.count(), 1)
+        with self.settings(TASK_ARCHIVE_DAYS=0):
+            self.assertIn('0 archived tasks pruned.', self.run_command())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REQUEST_PROFILER_SAMPLE_RATE=1)
+class ProfilerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserProfile.objects.create_user(
+            username='admin', email='admin@example.com', password='pw', role='Admin', is_active=True
+        )
+        cls.manager = UserProfile.objects.create_user(
+            username='manager', email='manager@example.com', password='pw', role='Manager', is_active=True
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.project = Project.objects.create(name='Project', description='', created_by=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        endpoint_stats.reset()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+        return client
+
+    def test_headers_and_stats(self):
+        client = self.client_for(self.admin)
+        responses = [client.get(f'/base/projects/{self.project.pk}/') for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        response = responses[0]
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        # Served from the cached project responses
+        self.assertEqual(responses[-1]['X-Query-Count'], '0')
+        self.assertEqual(response['X-Duplicate-Queries'], '0')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+, serializer;dur=[\d.]+, total;dur=[\d.]+$')
+
+        response = client.get('/account/profiler/')
+        self.assertEqual(response.status_code, 200)
+        [stats] = [stats for stats in response.json()['endpoints'] if stats['endpoint'].startswith('GET ')]
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(set(stats['latency_ms']), {'p50', 'p95', 'p99'})
+
+        self.assertEqual(client.delete('/account/profiler/').status_code, 204)
+        self.assertEqual(self.client_for(self.manager).get('/account/profiler/').status_code, 403)
+
+    def test_headers_only_for_admins(self):
+        response = self.client_for(self.manager).get(f'/base/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Query-Count', response)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(endpoint_stats.snapshot()[0]['requests'], 1)
+
+    def test_streams_measured_to_the_end(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                Task.objects.create(
+                    title=f'Task {index}', description='', due_date=timezone.now() + timedelta(days=1),
+                    project=self.project, created_by=self.admin, assigned_to=self.admin,
+                )
+        response = self.client_for(self.admin).get('/base/tasks/export/', {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Query-Count', response)
+        self.assertEqual(endpoint_stats.snapshot(), [])
+
+        rows = b''.join(response.streaming_content)
+        self.assertEqual(len(rows.splitlines()), 4)
+        [stats] = endpoint_stats.snapshot()
+        self.assertGreaterEqual(stats['queries_per_request'], 1)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_run_and_compare(self):
+        with redis_stand_in():
+            run = LoadBenchmark(200, requests=60, warmup=10).run()
+        self.assertEqual(run['failures'], [])
+        self.assertEqual(sum(stats['count'] for stats in run['endpoints'].values()), 60)
+        self.assertEqual(recount_projects(), [])
+
+        results = {'200': run}
+        self.assertEqual(compare(results, results), [])
+        slower = json.loads(json.dumps(run))
+        for stats in slower['endpoints'].values():
+            stats['queries_per_request'] += 1
+        self.assertEqual(len(compare(results, {'200': slower})), len(run['endpoints']))
+        self.assertEqual(len(compare(results, {'200': run, '300': run})), 1)
+
+        # Another machine, ten times slower across the board
+        elsewhere = json.loads(json.dumps(run))
+        elsewhere['requests_per_second'] /= 10
+        for stats in [elsewhere, *elsewhere['endpoints'].values()]:
+            stats['latency_ms'] = {percentile: ms * 10 for percentile, ms in stats['latency_ms'].items()}
+        self.assertNotEqual(compare(results, {'200': elsewhere}), [])
+        self.assertEqual(compare(results, {'200': elsewhere}, same_machine=False), [])
+        next(iter(elsewhere['endpoints'].values()))['latency_ms']['p50'] *= 2
+        self.assertEqual(len(compare(results, {'200': elsewhere}, same_machine=False)), 1)
+
+
+class SeedingTests(TestCase):
+
+    def test_seed(self):
+        users = Seeder(batch_size=70).run(users=30, projects=4, tasks=300)
+        self.assertEqual(len(users), 30)
+        self.assertEqual(EmailCode.objects.count(), 30)
+        self.assertEqual(
+            EmailCode.objects.filter(is_active=True).count(), sum(not is_active for _, _, is_active in users)
+        )
+        self.assertTrue(UserProfile.objects.get(pk=users[0][0]).check_password(SEED_PASSWORD))
+        self.assertEqual(Task.objects.count(), 300)
+        self.assertEqual(recount_projects(), [])
+        self.assertEqual(
+            search_tasks(Task.objects.all(), 'review').count(), Task.objects.filter(title__startswith='Review').count()
+        )
+
+        # The same seed gives the same data
+        again = Seeder(batch_size=300).run(users=30, projects=4, tasks=300)
+        self.assertEqual([role for _, role, _ in again], [role for _, role, _ in users])
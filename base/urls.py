@@ -1,11 +1,19 @@
 from django.urls import path
 from .views import (
     ProjectDetailView,
+    ProjectExportView,
     ProjectListCreateAPIView,
     ProjectRetrieveUpdateDestroyAPIView,
     TaskListCreateAPIView,
     TaskRetrieveUpdateDestroyAPIView,
+    TaskBulkAPIView,
+    TaskChangesView,
+    TaskExportView,
+    TaskEventsView,
+    ArchivedTaskListView,
     ApproveTaskView,
+    BulkApprovalView,
+    BulkRevokeApprovalView,
     RevokeApprovalView,
     PendingTasksView
     
@@ -15,13 +23,21 @@ urlpatterns = [
     path('projects/', ProjectListCreateAPIView.as_view(), name='project_create_list'),
     path('projects/<int:pk>/', ProjectRetrieveUpdateDestroyAPIView.as_view(), name='project_get_update'),
     path('project_details/<int:pk>/', ProjectDetailView.as_view(), name='project_detail'),
+    path('projects/export/', ProjectExportView.as_view(), name='projects_export'),
 
     path('tasks/', TaskListCreateAPIView.as_view(), name='task_create_list'),
     path('tasks/<int:pk>/', TaskRetrieveUpdateDestroyAPIView.as_view(), name='tasks_get_update'),
+    path('tasks/bulk/', TaskBulkAPIView.as_view(), name='tasks_bulk'),
+    path('tasks/changes/', TaskChangesView.as_view(), name='tasks_changes'),
+    path('tasks/events/', TaskEventsView.as_view(), name='tasks_events'),
+    path('tasks/export/', TaskExportView.as_view(), name='tasks_export'),
+    path('archive/tasks/', ArchivedTaskListView.as_view(), name='archived_tasks'),
 
 
     path('approve/<int:task_id>/', ApproveTaskView.as_view(), name='approve_task'),
     path('revoke/<int:task_id>/', RevokeApprovalView.as_view(), name='revoke_approval'),
+    path('approve/bulk/', BulkApprovalView.as_view(), name='approve_bulk'),
+    path('revoke/bulk/', BulkRevokeApprovalView.as_view(), name='revoke_bulk'),
     path('tasks/pending/', PendingTasksView.as_view(), name='pending-tasks')
 ]
 
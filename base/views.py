@@ -1,36 +1,105 @@
+from django.conf import settings
 from django.core.cache import cache
-from django.db.models import Count
-from django.db.models import Q
-from django.http import Http404
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
 from rest_framework.generics import (
+    GenericAPIView,
     ListAPIView,
     RetrieveAPIView,
     RetrieveUpdateDestroyAPIView,
     ListCreateAPIView
 )
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from account.authentication import AccessControlAuthentication
+from .approvals import approval_cache_data, approval_cache_key, approval_commits, approve_tasks, revoke_tasks
+from .conditional import ConditionalListMixin, ConditionalObjectMixin
+from .events import ALL_CHANNEL, project_channel, task_events, user_channel
+from .export import CSVRenderer, NDJSONRenderer, PROJECT_EXPORT_FIELDS, TASK_EXPORT_FIELDS, stream_rows
 from .models import Project
 from .models import Task
+from .models import PROJECT_COUNTERS
+from .models import TaskTombstone
+from .models import ArchivedTask
+from .pagination import ArchivePagination, DueDatePagination, ProjectPagination, TaskPagination
+from .response_cache import CachedProjectResponseMixin
+from .rows import FastListMixin
+from .search import TaskSearchFilter
+from .sync import task_changes
 from .permissions import IsAdminManager
 from .serializers import (
     TaskSerializer,
     ProjectSerializer,
-    ProjectDetailSerializer
+    ProjectDetailSerializer,
+    BulkTaskSerializer,
+    BulkTaskUpdateSerializer,
+    ArchivedTaskSerializer,
+    TaskIdsSerializer,
+    related_lookups
 )
-from .task import save_task_to_db
 
 
-class ProjectListCreateAPIView(ListCreateAPIView):
-    authentication_classes = [JWTAuthentication]
+class RelatedQuerysetMixin:
+    """
+    Joins and prefetches every relation the view's serializer tree reads
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetch_related = related_lookups(self.get_serializer_class(), queryset.model)
+        return queryset.select_related(*select_related).prefetch_related(*prefetch_related)
+
+
+class ExportMixin:
+    """
+    Streams the filtered queryset as NDJSON (default) or CSV, picked with
+    ``?format=ndjson|csv`` or the Accept header
+    """
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    export_fields = ()
+    export_name = None
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.accepted_renderer.format
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            stream_rows(queryset, self.export_fields, export_format),
+            content_type=request.accepted_renderer.media_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{export_format}"'
+        return response
+
+
+class VisibilityMixin:
+    """
+    Limits the queryset to the rows the user may reach in ``access_scope``
+    (see AccessQuerySet), so lookups of anything else are plain 404s
+    answered by the same query
+    """
+    access_scope = 'view'
+
+    def get_access_scope(self):
+        return self.access_scope
+
+    def get_queryset(self):
+        return super().get_queryset().for_user(self.request.user, self.get_access_scope())
+
+
+class ProjectListCreateAPIView(FastListMixin, VisibilityMixin, RelatedQuerysetMixin, ListCreateAPIView):
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAdminManager]
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    pagination_class = ProjectPagination
     lookup_field = "id"
 
     def dispatch(self, request, *args, **kwargs):
@@ -42,62 +111,161 @@ class ProjectListCreateAPIView(ListCreateAPIView):
         return {"user": self.request.user}
 
 
-class ProjectRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+class ProjectExportView(ExportMixin, VisibilityMixin, GenericAPIView):
+    authentication_classes = [AccessControlAuthentication]
+    permission_classes = [IsAdminManager]
+    queryset = Project.objects.all()
+    export_fields = PROJECT_EXPORT_FIELDS
+    export_name = 'projects'
+
+
+class ProjectRetrieveUpdateDestroyAPIView(
+    CachedProjectResponseMixin, ConditionalObjectMixin, VisibilityMixin, RelatedQuerysetMixin,
+    RetrieveUpdateDestroyAPIView
+):
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAdminManager]
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    response_cache_name = 'retrieve'
 
     def dispatch(self, request, *args, **kwargs):
         if request.method.lower() != "get" and self.request.user.is_manager:
             return self.http_method_not_allowed(request, *args, **kwargs)
         return super().dispatch(request, *args, **kwargs)
 
+    def get_access_scope(self):
+        return 'view' if self.request.method in SAFE_METHODS else 'change'
+
     def get_serializer_context(self):
         return {"user": self.request.user}
 
+    def object_state(self, instance):
+        tasks_updated_at = max((task.updated_at for task in instance.tasks.all()), default=None)
+        return instance.pk, instance.updated_at, instance.total_tasks, tasks_updated_at
+
+    def lookup_state(self, queryset):
+        return queryset.annotate(
+            tasks_updated_at=Max('tasks__updated_at')
+        ).values_list('pk', 'updated_at', 'total_tasks', 'tasks_updated_at').first()
+
 
-class ProjectDetailView(RetrieveAPIView):
-    authentication_classes = [JWTAuthentication]
+class ProjectDetailView(
+    CachedProjectResponseMixin, ConditionalObjectMixin, VisibilityMixin, RelatedQuerysetMixin, RetrieveAPIView
+):
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAdminManager]
-    queryset = Project.objects.prefetch_related('tasks').annotate(
-        total_tasks=Count('tasks'),
-        completed_tasks=Count('tasks', filter=Q(tasks__status='Completed')),
-    )
+    queryset = Project.objects.all()
     serializer_class = ProjectDetailSerializer
+    response_cache_name = 'details'
+    counter_fields = PROJECT_COUNTERS
 
     def dispatch(self, request, *args, **kwargs):
         if request.method.lower() != "get" and self.request.user.is_manager:
             return self.http_method_not_allowed(request, *args, **kwargs)
         return super().dispatch(request, *args, **kwargs)
 
+    def object_state(self, instance):
+        return (instance.pk, instance.updated_at, *(getattr(instance, field) for field in self.counter_fields))
+
+    def lookup_state(self, queryset):
+        return queryset.values_list('pk', 'updated_at', *self.counter_fields).first()
 
-class TaskListCreateAPIView(ListCreateAPIView):
-    authentication_classes = [JWTAuthentication]
+
+class TaskListCreateAPIView(
+    FastListMixin, ConditionalListMixin, VisibilityMixin, RelatedQuerysetMixin, ListCreateAPIView
+):
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    pagination_class = TaskPagination
     lookup_field = "id"
-    filter_backends = [DjangoFilterBackend]
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter]
     filterset_fields = ['status']
 
     def get_serializer_context(self):
         return {"user": self.request.user}
 
-    def get_queryset(self):
+
+class TaskChangesView(VisibilityMixin, RelatedQuerysetMixin, ListAPIView):
+    """
+    Delta sync: the visible tasks created or updated since the ``since``
+    watermark, the ids of the ones deleted or reassigned away since then and
+    the watermark to send next time. Without ``since`` every visible task is
+    returned; keep calling with the new watermark while ``has_more``.
+    """
+    authentication_classes = [AccessControlAuthentication]
+    permission_classes = [IsAuthenticated]
+    queryset = Task.objects.all()
+    serializer_class = TaskSerializer
+    pagination_class = TaskPagination
+
+    def get_serializer_context(self):
+        return {"user": self.request.user}
+
+    def get_tombstones(self):
         if self.request.user.is_user:
-            return super().get_queryset().filter(
-                assigned_to=self.request.user
-            )
-        return super().get_queryset()
+            return TaskTombstone.objects.filter(assigned_to_id=self.request.user.id)
+        return TaskTombstone.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        changed, deleted, watermark, has_more = task_changes(
+            self.get_queryset(),
+            self.get_tombstones(),
+            request.query_params.get('since'),
+            self.pagination_class().get_page_size(request),
+        )
+        return Response({
+            'tasks': self.get_serializer(changed, many=True).data,
+            'deleted': deleted,
+            'watermark': watermark,
+            'has_more': has_more,
+        })
+
+
+class TaskExportView(ExportMixin, VisibilityMixin, GenericAPIView):
+    authentication_classes = [AccessControlAuthentication]
+    permission_classes = [IsAuthenticated]
+    queryset = Task.objects.all()
+    filter_backends = [DjangoFilterBackend, TaskSearchFilter]
+    filterset_fields = ['status']
+    export_fields = TASK_EXPORT_FIELDS
+    export_name = 'tasks'
 
 
-class TaskRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
-    authentication_classes = [JWTAuthentication]
+class ArchivedTaskListView(VisibilityMixin, ListAPIView):
+    """
+    Completed tasks moved to the archive by task_deletion, for one
+    ``project_id``, optionally within an ``updated_at__gte`` /
+    ``updated_at__lt`` completion date range, most recent first
+    """
+    authentication_classes = [AccessControlAuthentication]
+    permission_classes = [IsAuthenticated]
+    queryset = ArchivedTask.objects.all()
+    serializer_class = ArchivedTaskSerializer
+    pagination_class = ArchivePagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'project_id': ['exact'],
+        'updated_at': ['gte', 'lt'],
+    }
+
+    def filter_queryset(self, queryset):
+        # Archive reads are served by the (project_id, updated_at) index
+        if not self.request.query_params.get('project_id'):
+            raise ValidationError({'project_id': 'This parameter is required.'})
+        return super().filter_queryset(queryset)
+
+
+class TaskRetrieveUpdateDestroyAPIView(
+    ConditionalObjectMixin, VisibilityMixin, RelatedQuerysetMixin, RetrieveUpdateDestroyAPIView
+):
+    authentication_classes = [AccessControlAuthentication]
     permission_classes = [IsAuthenticated]
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
-    lookup_field = "id"
+    access_scope = 'change'
 
     def dispatch(self, request, *args, **kwargs):
         if request.method.lower() == "delete" and self.request.user.is_user:
@@ -108,11 +276,50 @@ class TaskRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         return {"user": self.request.user}
 
     def get_object(self):
-        task = super().get_object()
-        if task.assigned_to != self.request.user:
+        try:
+            return super().get_object()
+        except Http404:
             raise Http404("You don't have permission to access this task")
 
-        return task
+
+class TaskBulkAPIView(APIView):
+    """
+    Create (POST) or partially update (PATCH) up to TASK_BULK_MAX_SIZE tasks
+    in one request and one transaction
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer(self, serializer_class, **kwargs):
+        return serializer_class(
+            many=True,
+            max_length=getattr(settings, 'TASK_BULK_MAX_SIZE', 5000),
+            context={"user": self.request.user},
+            **kwargs
+        )
+
+    def post(self, request):
+        serializer = self.get_serializer(BulkTaskSerializer, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tasks = serializer.save()
+        return Response(TaskSerializer(tasks, many=True).data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        serializer = self.get_serializer(BulkTaskUpdateSerializer, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        # Same visibility as TaskRetrieveUpdateDestroyAPIView
+        ids = [item['id'] for item in serializer.validated_data]
+        tasks = Task.objects.for_user(request.user, 'change').in_bulk(ids)
+        missing = [task_id for task_id in ids if task_id not in tasks]
+        if missing:
+            return Response({
+                'error': "You don't have permission to access these tasks",
+                'ids': missing
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        serializer.instance = tasks
+        tasks = serializer.save()
+        return Response(TaskSerializer(tasks, many=True).data, status=status.HTTP_200_OK)
 
 
 class ApproveTaskView(APIView):
@@ -126,26 +333,20 @@ class ApproveTaskView(APIView):
             return Response({'error': 'You do not have permission to approve tasks.'}, status=403)
 
         # Get the task object
-        task = get_object_or_404(Task, id=task_id)
+        task = get_object_or_404(Task.objects.for_user(user, 'approve'), id=task_id)
 
         if task.status != 'Pending Approval':
             return Response({'error': 'This task cannot be approved as it is not pending approval.'}, status=400)
 
-        # Temporarily save task data in Redis
-        task_data = {
-            'title': task.title,
-            'description': task.description,
-            'status': task.status,
-            'created_at': str(task.created_at)
-        }
-        cache.set(f'task:{task_id}', task_data, timeout=300)  # Store in Redis for 5 minutes
+        # Temporarily save task data in Redis, until the approval is committed
+        cache.set(approval_cache_key(task_id), approval_cache_data(task), timeout=approval_commits.cache_timeout)
 
         # Update task status to approved
         task.status = 'Approved'
         task.save()
 
-        # Schedule the Celery task to save the task in the main database after 5 minutes
-        save_task_to_db.apply_async((task.id,), countdown=300)  # 5-minute delay
+        # Committed in the main database after 5 minutes, with the other due approvals
+        approval_commits.schedule_on_commit([task.id])
 
         return Response({'message': 'Task has been approved and will be saved in 5 minutes.'}, status=200)
 
@@ -154,35 +355,119 @@ class RevokeApprovalView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, task_id):
-        # Get the task object
-        task = get_object_or_404(Task, id=task_id)
+        if not request.user.is_manager:
+            return Response({'error': 'You do not have permission to revoke approvals.'}, status=403)
 
-        # Check if the task is approved
-        if task.status != 'Approved':
-            return Response({'error': 'This task cannot be revoked as it is not approved.'}, status=400)
+        with transaction.atomic():
+            # Get the task object, locked against a commit of its approval
+            task = get_object_or_404(
+                Task.objects.for_user(request.user, 'approve').select_for_update(), id=task_id
+            )
 
-        # Revoke approval (set status back to "Pending Approval")
-        task.status = 'Pending Approval'
-        task.save()
+            # Check if the task is approved
+            if task.status != 'Approved':
+                return Response({'error': 'This task cannot be revoked as it is not approved.'}, status=400)
 
-        # Remove the task from Redis if it is cached
-        cache_key = f'task:{task_id}'
-        if cache.get(cache_key):
-            cache.delete(cache_key)
+            # Revoke approval (set status back to "Pending Approval")
+            task.status = 'Pending Approval'
+            task.save()
+
+            # Remove the task from Redis if it is cached, before the row lock is released
+            cache.delete(approval_cache_key(task_id))
+
+        # And its queued commit
+        approval_commits.cancel([task_id])
 
         return Response({'message': 'Task approval has been revoked and will not be saved to the database.'},
                         status=200)
 
 
-class PendingTasksView(ListAPIView):
+class BulkApprovalView(APIView):
+    """
+    Approves every task of ``ids`` that is pending approval, with one query
+    to check them, one UPDATE, one cache round trip and one queued commit,
+    and reports what happened to each id
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = TaskSerializer
+    change = staticmethod(approve_tasks)
+    forbidden_message = 'You do not have permission to approve tasks.'
+
+    def post(self, request):
+        if not request.user.is_manager:
+            return Response({'error': self.forbidden_message}, status=403)
+
+        serializer = TaskIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        outcomes = self.change(Task.objects.for_user(request.user, 'approve'), serializer.validated_data['ids'])
+        return Response({
+            'results': [{'id': task_id, 'result': outcome} for task_id, outcome in outcomes.items()]
+        }, status=200)
 
-    def get_queryset(self):
-        user = self.request.user
-        # Check if the user is a manager
-        if user.role != 'Manager':
-            return Task.objects.none()  # Return no tasks if the user is not a manager
 
-        # Return tasks with "Pending Approval" status
-        return Task.objects.filter(status='Pending Approval')
+class BulkRevokeApprovalView(BulkApprovalView):
+    """
+    Sends every approved task of ``ids`` back to Pending Approval and drops
+    its cached approval, reporting what happened to each id
+    """
+    change = staticmethod(revoke_tasks)
+    forbidden_message = 'You do not have permission to revoke approvals.'
+
+
+class PendingTasksView(FastListMixin, VisibilityMixin, RelatedQuerysetMixin, ListAPIView):
+    permission_classes = [IsAuthenticated]
+    queryset = Task.objects.filter(status='Pending Approval')
+    serializer_class = TaskSerializer
+    pagination_class = DueDatePagination
+    # Only managers see the tasks waiting for their approval
+    access_scope = 'approve'
+
+
+class TaskEventsView(View):
+    """
+    Server-Sent Events stream of task created/updated/approved/revoked/
+    deleted/archived events, replacing polling of the task lists. Regular users get
+    the events of their own tasks; admins and managers get every task, or
+    only those of the projects given as ``?project=<id>`` (repeatable).
+    Reconnects resume after the ``Last-Event-ID`` header (or the
+    ``last_event_id`` parameter). Needs the ASGI application, under WSGI the
+    stream would hold a worker thread forever and gets a 501 instead.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {'error': 'Task events are only served by the ASGI application.'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        user = request.user
+        try:
+            project_ids = [int(project_id) for project_id in request.GET.getlist('project')]
+            last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return JsonResponse({'error': 'project and Last-Event-ID must be integers'}, status=400)
+
+        channels = [user_channel(user.id)]
+        if user.is_user:
+            if project_ids:
+                return JsonResponse({'error': 'You can only follow your own tasks.'}, status=403)
+        elif project_ids:
+            channels.extend(project_channel(project_id) for project_id in project_ids)
+        else:
+            channels.append(ALL_CHANNEL)
+
+        response = StreamingHttpResponse(
+            self.stream(channels, last_event_id), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, channels, last_event_id):
+        yield 'retry: 3000\n\n'
+        async for event in task_events.subscribe(channels, last_event_id):
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            event_id, kind, data = event
+            yield f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'
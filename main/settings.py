@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'account.profiler.RequestProfilerMiddleware',
     'account.middleware.AccessControlMiddleware',
 ]
 
@@ -140,14 +141,84 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+REST_FRAMEWORK = {
+    # AccessControlMiddleware has already authenticated the request, DRF reuses its result
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'account.authentication.AccessControlAuthentication',
+    ],
+    # Keyset pagination, list views pick their ordering in base.pagination
+    'DEFAULT_PAGINATION_CLASS': 'base.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
 AUTH_USER_MODEL = 'account.UserProfile'
 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Share of requests profiled by account.profiler.RequestProfilerMiddleware
+# (0 disables it), see /account/profiler/. Its response headers go to admins
+# and in DEBUG, or to every client with REQUEST_PROFILER_PUBLIC_HEADERS
+REQUEST_PROFILER_SAMPLE_RATE = 0
+REQUEST_PROFILER_MAX_SAMPLES = 1000
+REQUEST_PROFILER_PUBLIC_HEADERS = False
+
+# Stored benchmark_api results that --compare runs must not regress from
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+
 TASK_DELETION_DAYS = 2
 
+# task_deletion deletes in batches of TASK_DELETION_BATCH_SIZE tasks, one
+# transaction each, pausing TASK_DELETION_SLEEP seconds in between, and
+# stops after TASK_DELETION_TIME_BUDGET seconds (0 for no limit)
+TASK_DELETION_BATCH_SIZE = 1000
+TASK_DELETION_SLEEP = 0.1
+TASK_DELETION_TIME_BUDGET = 600
+
+# Move the old completed tasks to the archive table (base.archive,
+# /base/archive/tasks/) instead of dropping them, and drop archived tasks
+# completed more than TASK_ARCHIVE_DAYS ago (0 keeps them forever)
+TASK_DELETION_ARCHIVE = False
+TASK_ARCHIVE_DAYS = 365
+
+# How long deletions stay replayable by /base/tasks/changes/, older
+# watermarks get 410 Gone and must resync
+TASK_TOMBSTONE_DAYS = 30
+
+# Largest batch accepted by /base/tasks/bulk/
+TASK_BULK_MAX_SIZE = 5000
+
+# Rows fetched per round trip by /base/tasks/export/, /base/projects/export/
+# and the export_data command
+EXPORT_CHUNK_SIZE = 2000
+
+# Task and project lists built from values() rows and rendered with orjson
+# (base.rows), same output as the serializers; False to go through them again
+FAST_LIST_RESPONSES = True
+
+# Upper bound on verified access tokens kept per process by AccessControlMiddleware
+ACCESS_TOKEN_CACHE_SIZE = 4096
+
+# Seconds a process reuses a user's token revocation marker before reading
+# it from the default cache again; with FAIL_OPEN an unreachable cache counts
+# as no revocation, otherwise authenticated requests get a 503
+TOKEN_REVOCATION_LOCAL_TIMEOUT = 5
+TOKEN_REVOCATION_FAIL_OPEN = True
+
+# UserProfile cache used by the middleware and nested serializers
+# (account.user_cache), the shared tier lives in the default cache
+USER_CACHE_SIZE = 2048
+USER_CACHE_LOCAL_TIMEOUT = 60
+USER_CACHE_SHARED = True
+USER_CACHE_SHARED_TIMEOUT = 300
+
+# Serialized project detail/retrieve responses in the default cache
+# (base.response_cache), invalidated per project on every task/project write
+PROJECT_RESPONSE_CACHE_TIMEOUT = 300
+PROJECT_RESPONSE_CACHE_LOCK_TIMEOUT = 10
+PROJECT_RESPONSE_CACHE_LOCK_WAIT = 2.0
+
 
 
 
@@ -162,6 +233,23 @@ CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+# Task event push (base.events, /base/tasks/events/): pub/sub fan-out across
+# workers plus a short per-channel history for Last-Event-ID resumes
+TASK_EVENTS_REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
+TASK_EVENTS_HISTORY_SIZE = 1000
+TASK_EVENTS_HISTORY_TIMEOUT = 3600
+TASK_EVENTS_KEEPALIVE = 15
+
+# Approval commits (base.approvals): queued in a Redis sorted set and
+# committed APPROVAL_COMMIT_DELAY seconds after approval by the
+# commit_due_approvals job, which runs every APPROVAL_COMMIT_INTERVAL seconds;
+# batches of a drain that died are retried after APPROVAL_COMMIT_CLAIM_TIMEOUT
+APPROVAL_COMMITS_REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
+APPROVAL_COMMIT_DELAY = 300
+APPROVAL_COMMIT_INTERVAL = 10
+APPROVAL_COMMIT_BATCH_SIZE = 500
+APPROVAL_COMMIT_CLAIM_TIMEOUT = 300
+
 # Cache Configuration (Redis)
 CACHES = {
     "default": {